@@ -0,0 +1,34 @@
+"""
+Offline bulk renderer: renders a batch of jobs into WAV files using every core (synth/class_BulkRenderer.py).
+
+Jobs come from a .jsonl file (one job per line), a .json file or a directory of them:
+
+    {"name": "bell_arp", "preset": "bell", "grid": [["C4"], null, ["E4", "G4"]], "step_len": 0.25, "loops": 4}
+    {"name": "pad", "params": {...preset dictionary...}, "grid": [[48, 55, 64]], "step_len": 2.0, "format": "int24"}
+
+    python bulk_render.py jobs.jsonl --out renders --workers 8
+
+Jobs already rendered (same content hash in the file name) are skipped.
+"""
+import argparse
+import sys
+from synth.class_BulkRenderer import BulkRenderer, loadJobs
+from synth.class_PresetStore import DEFAULT_PRESET_STORE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FM synth offline bulk renderer")
+    parser.add_argument("jobs", help="jobs file (.jsonl / .json) or directory of job files")
+    parser.add_argument("--out", default="renders", help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: every core)")
+    parser.add_argument("--voices", type=int, default=6, help="polyphony of every render")
+    parser.add_argument("--presets", default=DEFAULT_PRESET_STORE, help="preset bank used by 'preset' jobs")
+    args = parser.parse_args()
+
+    renderer = BulkRenderer(args.out, workers=args.workers, numVoices=args.voices, presetFile=args.presets)
+    summary = renderer.run(loadJobs(args.jobs))
+    return 1 if summary["failed"] or summary["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,21 @@
 # this file connects parameters setting from javaScript (frontend) to Python (backend)
 
 from flask import Blueprint, jsonify, current_app, request
+import threading
+from synth.class_ParamRegistry import PARAMS, LFO_FIELDS, ENV_ALIASES
+from synth.class_Metrics import PARAM_UPDATES
 
 api_bp = Blueprint('api_bp', __name__)
 
+params_lock = threading.Lock() # batches are applied one at a time
+
+
+def _schedule_prerender():
+    """ starts (after a debounce) the background render of the audition for the new sound version """
+    prerenderer = getattr(current_app, "prerenderer", None)
+    if prerenderer is not None:
+        prerenderer.schedule()
+
 
 @api_bp.route('/synth/preset', methods=['GET'])
 def get_synth_preset():
@@ -15,57 +27,50 @@ def get_synth_preset():
         print(f"❌ get_synth_preset Error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@api_bp.route('/synth/params', methods=['GET'])
+def get_synth_params():
+    """ parameter descriptors (ranges, units, preset keys -> html ids) from the registry """
+    return jsonify(PARAMS.toDict()), 200
+
+# batched updates: [{"name": "ratio_A", "value": 2}, {"name": "rate", "value": 3, "lfoIndex": 1}, ...]
+@api_bp.route('/params', methods=['POST'])
+def update_params():
+    try:
+        data = request.get_json()
+        updates = data.get('updates') if isinstance(data, dict) else data
+        if not isinstance(updates, list):
+            return jsonify({"error": "Missing data: a list of updates expected"}), 400
+        
+        synth = current_app.synth
+
+        with params_lock:
+            applied = PARAMS.applyUpdates(synth.sound, updates)
+            version = synth.sound.getVersion()
+        PARAM_UPDATES.inc(len(applied))
+        _schedule_prerender()
+        return jsonify({"status": "ok", "received": len(updates), "applied": len(applied), "version": version})
+
+    except KeyError as e:
+        return jsonify({"error": f"Parameter {e} not mapped"}), 400
+    except (ValueError, TypeError, AttributeError):
+        return jsonify({"error": "Invalid parameter value"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # generic dispatcher
 @api_bp.route('/update-param', methods=['POST'])
 def update_param():
     try:
         data = request.get_json()
         param_name = data.get('name')
-        value = float(data.get('value'))
         
         synth = current_app.synth
 
-        param_map = { # map IDs to functions
-            'ratio_A': synth.sound.setRatioA,
-            'feedback_A': synth.sound.setFeedbackA,
-            'level_A': synth.sound.setLevA,
-            'attack_A': synth.sound.setAttackA,
-            'decay_A': synth.sound.setDecayA,
-            'sustain_A': synth.sound.setSustainA,
-            'release_A': synth.sound.setReleaseA,
-            
-            'ratio_B1': synth.sound.setRatioB1,
-            'feedback_B1': synth.sound.setFeedbackB1,
-            'level_B1': synth.sound.setLevB1,
-            'attack_B1': synth.sound.setAttackB1,
-            'decay_B1': synth.sound.setDecayB1,
-            'sustain_B1': synth.sound.setSustainB1,
-            'release_B1': synth.sound.setReleaseB1,
-            
-            'ratio_B2': synth.sound.setRatioB2,
-            'feedback_B2': synth.sound.setFeedbackB2,
-            'level_B2': synth.sound.setLevB2,
-            'attack_B2': synth.sound.setAttackB2,
-            'decay_B2': synth.sound.setDecayB2,
-            'sustain_B2': synth.sound.setSustainB2,
-            'release_B2': synth.sound.setReleaseB2,
-            
-            'ratio_C': synth.sound.setRatioC,
-            'feedback_C': synth.sound.setFeedbackC,
-
-            'mix' : synth.sound.setMix,
-
-            'attack_amp': synth.sound.setAttackAmp,
-            'decay_amp': synth.sound.setDecayAmp,
-            'sustain_amp': synth.sound.setSustainAmp,
-            'release_amp': synth.sound.setReleaseAmp,
-            'master_vol': synth.sound.setMasterVolume,
-        }
-
-        if param_name in param_map:
-            # DYNAMIC CALL
-            function_to_call = param_map[param_name]
-            function_to_call(value)
+        if PARAMS.byId(param_name) is not None: # O(1) lookup in the parameter registry
+            value = PARAMS.setParam(synth.sound, param_name, data.get('value'))
+            PARAM_UPDATES.inc()
+            _schedule_prerender()
             
             print(f"[OK] {param_name} set to {value}")
             return jsonify({"status": "ok", "param": param_name, "value": value})
@@ -73,12 +78,26 @@ def update_param():
             print(f"[ERR] Unknown parameter: {param_name}")
             return jsonify({"error": f"Parameter '{param_name}' not mapped"}), 400
 
-    except ValueError:
+    except (ValueError, TypeError):
          return jsonify({"error": "Invalid parameter value"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 
+# audition pre-rendered after parameter changes: {"mode": "grid"} or {"mode": "note", "note": 60, "seconds": 1.0}
+@api_bp.route('/audition', methods=['POST'])
+def set_audition():
+    try:
+        data = request.get_json()
+        prerenderer = current_app.prerenderer
+        prerenderer.setAuditionMode(data.get('mode', 'grid'), data.get('note'), data.get('seconds'))
+        _schedule_prerender()
+        sequence, step_len, _ = prerenderer.getAudition()
+        return jsonify({"status": "ok", "mode": data.get('mode', 'grid'), "audition": sequence, "step_len": step_len})
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+
 @api_bp.route('/set-algorithm', methods=['POST'])
 def setAlgorithm():
     try:
@@ -88,6 +107,8 @@ def setAlgorithm():
             return jsonify({"error": "Missing data: key 'algorithm' expected"}), 400
         new_algorithm = int(data.get('algorithm'))
         synth.sound.setAlgorithm(new_algorithm) 
+        PARAM_UPDATES.inc()
+        _schedule_prerender()
         return jsonify({
             "status": "success", 
             "message": f"algorithm set to {new_algorithm}"
@@ -103,27 +124,15 @@ def update_lfo_param():
     try:
         data = request.get_json()
         param_name = data.get('name')
-
-        value = None if data.get('value')=="None" else float(data.get('value')) # safe conversion
-
-        if param_name in ['dest', 'wave']: # further conversion
-            value = None if value is None else int(value)
-
         index = int(data.get('lfoIndex'))
         
         synth = current_app.synth
-        
-        param_map = {
-            'dest': synth.sound.setLfoDestination,
-            'wave': synth.sound.setLfoWaveform,
-            'amount': synth.sound.setLfoAmount,
-            'rate': synth.sound.setLfoRate,
-            'smooth': synth.sound.setLfoSmooth,
-        }
-
-        if param_name in param_map:
-            function_to_call = param_map[param_name]
-            function_to_call(index, value) # e.g. setLfoRate(index=1, rate=value)
+
+        if param_name in LFO_FIELDS:
+            # e.g. setLfoRate(index=1, rate=value)
+            value = PARAMS.setLfoParam(synth.sound, param_name, index, data.get('value'))
+            PARAM_UPDATES.inc()
+            _schedule_prerender()
             
             print(f"[OK] {param_name} set to {value}")
             return jsonify({"status": "ok", "param": param_name, "value": value})
@@ -131,7 +140,7 @@ def update_lfo_param():
             print(f"[ERR] Unknown parameter: {param_name}")
             return jsonify({"error": f"Parameter '{param_name}' not mapped"}), 400
 
-    except ValueError:
+    except (ValueError, TypeError):
          return jsonify({"error": "The value is an invalid number"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -142,21 +151,13 @@ def update_env_param():
     try:
         data = request.get_json()
         param_name = data.get('name')
-        value = None if data.get('value')=="None" else float(data.get('value')) #safe conversion
-        if param_name == 'dest': # forther conversion
-            value = None if value is None else int(value)
         
         synth = current_app.synth
 
-        param_map = {
-            'dest': synth.sound.setEnvDestination,
-            'amount': synth.sound.setEnvAmount,
-            'release': synth.sound.setEnvRelease,
-        }
-
-        if param_name in param_map:
-            function_to_call = param_map[param_name]
-            function_to_call(value)
+        if param_name in ENV_ALIASES:
+            value = PARAMS.setParam(synth.sound, ENV_ALIASES[param_name], data.get('value'))
+            PARAM_UPDATES.inc()
+            _schedule_prerender()
             
             print(f"[OK] {param_name} impostato a {value}")
             return jsonify({"status": "ok", "param": param_name, "value": value})
@@ -164,7 +165,7 @@ def update_env_param():
             print(f"[ERR] Unknown parameter: {param_name}")
             return jsonify({"error": f"Parameter '{param_name}' not mapped"}), 400
 
-    except ValueError:
+    except (ValueError, TypeError):
          return jsonify({"error": "The value is an invalid number"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
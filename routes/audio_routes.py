@@ -1,19 +1,39 @@
 # generate audio and send to js
-from flask import Blueprint, send_file, current_app, request
-import io
-import wave
-import numpy as np
+from flask import Blueprint, send_file, current_app, request, jsonify
 import json
+import tempfile
+import time
+import numpy as np
+from routes.api_routes import params_lock
+from synth.class_WavWriter import WavWriter, SAMPLE_FORMATS
+from synth.class_BatchSynthesiser import BatchSynthesiser
+from synth.class_ParamRegistry import PARAMS
+from synth.class_RenderBudget import RenderRejected
+from synth.class_Metrics import observeRender
 
 audio_bp = Blueprint('audio_bp', __name__)
 
 SAMPLERATE = 44100
+PREVIEW_SAMPLERATE = 22050 # quality=preview: half the synthesis cost, the browser resamples on playback
+LONG_EXPORT_SECONDS = 60   # longer exports are rendered to a temporary file on disk (bounded memory)
+DEFAULT_STEM_TAPS = ("voices", "X", "Y")
+
+
+def _session_id() -> str:
+    """ render budget session: X-Session-Id header if the client sends one, else the client address """
+    return request.headers.get('X-Session-Id') or request.remote_addr or "local"
 
 @audio_bp.route('/audio')
 def generate_audio():
     data_str = request.args.get('data')
     # check if it's an export request
     is_export = request.args.get('export') == 'true' 
+    # preview quality (Play only: exports are always rendered at full rate)
+    sample_rate = PREVIEW_SAMPLERATE if request.args.get('quality') == 'preview' and not is_export else SAMPLERATE
+    # WAV sample format: int16 (default), int24 or float32
+    sample_format = request.args.get('format', 'int16')
+    if sample_format not in SAMPLE_FORMATS:
+        return "Invalid Format", 400
     
     if data_str:
         try:
@@ -21,6 +41,7 @@ def generate_audio():
             frontend_data = json.loads(data_str)
             raw_grid = frontend_data.get('grid', []) 
             step_len = float(frontend_data.get('step_len', 0.5)) 
+            num_loops = max(1, int(frontend_data.get('loops', 1)))
             
             # conversion. List -> Tuple
             processed_grid = []
@@ -31,43 +52,48 @@ def generate_audio():
                 else:
                     processed_grid.append(tuple(step))
             
-            # DEBUG PRINT
-            print(f"processed grid: {processed_grid}")
-            print(f"Step Length: {step_len}")
+            print(f"[AUDIO] {len(processed_grid)} steps, step {step_len} s, {num_loops} loops, {sample_rate} Hz")
 
             # SOUND GENERATION
             try:
-                synth = current_app.synth
+                prerenderer = current_app.prerenderer
             except AttributeError:
-                print("ERRORE: Unable to connect to app.synth.")
+                print("ERRORE: Unable to connect to app.prerenderer.")
                 return "Errore server", 500
             
-            # reset phase at the beginning for coherence
-            synth.resetPhases()
-            synth.resetLfoPhases()
+            stem_taps = request.args.get('stems')
+            if stem_taps and not is_export:
+                return "Stems are available for exports only", 400
 
-            # Sound generation
-            sig = synth.sequencer.create_sequence(processed_grid, step_len)
-            
-            # wav conversion
-            memory_file = io.BytesIO()
-            
-            # mono/stereo
-            if sig.ndim == 1: n_channels = 1
-            elif sig.ndim == 2: n_channels = sig.shape[1]
-            else: n_channels = 1 
-            
-            sig = np.nan_to_num(sig, nan=0.0, posinf=1.0, neginf=-1.0)
-            sig = np.clip(sig, -1.0, 1.0)
-            pcm_data = (sig * 32767).astype(np.int16)
-
-            with wave.open(memory_file, 'wb') as wf:
-                wf.setnchannels(n_channels)
-                wf.setsampwidth(2)
-                wf.setframerate(SAMPLERATE)
-                wf.writeframes(pcm_data.tobytes())
+            # LONG EXPORT: rendered to disk and sent from the file (bounded memory)
+            duration = step_len * len(processed_grid) * num_loops
+            to_disk = is_export and not stem_taps and (request.args.get('target') == 'disk' or duration > LONG_EXPORT_SECONDS)
+
+            # ADMISSION CONTROL: the cost is estimated before rendering. 
+            # Plays over budget fall back to preview quality if that fits, exports are rejected
+            # (disk exports have their own, longer limit)
+            budget = current_app.renderBudget
+            release = prerenderer.synth.sound.getReleaseAmp() * 0.001
+            requested_rate = sample_rate
+            sample_rate = budget.admit(len(processed_grid), step_len, num_loops, release, sample_rate,
+                                       previewRate=None if is_export else PREVIEW_SAMPLERATE, toDisk=to_disk)
+
+            with budget.slot(_session_id()): # waits in the render queue for a free slot
+                # STEMS (export only): voices and X/Y channels rendered in one pass, one WAV channel each
+                if stem_taps:
+                    taps = DEFAULT_STEM_TAPS if stem_taps == 'true' else stem_taps.split(',')
+                    return _export_stems(prerenderer, processed_grid, step_len, num_loops, sample_rate, sample_format, taps)
+
+                if to_disk:
+                    return _export_from_disk(prerenderer, processed_grid, step_len, num_loops, sample_rate, sample_format)
+
+                # every render starts from a fresh engine (coherent phases).
+                # returns immediately if this version was already pre-rendered after the last parameter change
+                sig = prerenderer.renderAudio(processed_grid, step_len, sample_rate, num_loops)
             
-            memory_file.seek(0)
+            # wav conversion: chunks are clipped and converted directly into the file buffer
+            # (mono/stereo from the shape of sig)
+            memory_file = WavWriter.encode(sig, sample_rate, sample_format)
 
             # EXPORT VS PLAY
             if is_export:
@@ -78,11 +104,17 @@ def generate_audio():
                     download_name='Fm_sequence.wav'
                 )
             else: # play
-                return send_file(
+                response = send_file(
                     memory_file, 
                     mimetype='audio/wav'
                 )
+                if sample_rate != requested_rate:
+                    response.headers['X-Render-Quality'] = 'preview' # degraded by the render budget
+                return response
             
+        except RenderRejected as e:
+            print(f"[BUDGET] rejected: {e}")
+            return str(e), e.status
         except json.JSONDecodeError:
             print("Errore JSON")
             return "Data Error", 400
@@ -90,4 +122,85 @@ def generate_audio():
             print(f"Generic Error: {e}")
             return "Server Errore", 500
             
-    return "No Data Recieved", 400
\ No newline at end of file
+    return "No Data Recieved", 400
+
+
+def _export_stems(prerenderer, grid, step_len, num_loops, sample_rate, sample_format, taps):
+    """ multichannel WAV: one channel per stem (names in the X-Stem-Names header) """
+    try:
+        _, stems, names = prerenderer.renderStems(grid, step_len, taps, sample_rate, num_loops)
+    except ValueError as e:
+        return str(e), 400
+    print(f"Stems export: {names}")
+    response = send_file(WavWriter.encode(stems.T, sample_rate, sample_format), mimetype='audio/wav',
+                         as_attachment=True, download_name='Fm_sequence_stems.wav')
+    response.headers['X-Stem-Names'] = ",".join(names)
+    return response
+
+
+def _export_from_disk(prerenderer, grid, step_len, num_loops, sample_rate, sample_format):
+    """ renders the WAV into a temporary file on disk and sends it from there.
+    the file is deleted when send_file closes it """
+    wav_file = tempfile.TemporaryFile(suffix=".wav")
+    try:
+        num_samples = prerenderer.renderToWav(wav_file, grid, step_len, sample_rate, num_loops, sample_format)
+        size = wav_file.seek(0, 2)
+        print(f"Long export: {num_samples} samples written to disk")
+        wav_file.seek(0)
+        response = send_file(wav_file, mimetype='audio/wav', as_attachment=True, download_name='Fm_sequence.wav')
+        response.content_length = size # unknown for a file object: sent to the client and counted in the metrics
+        return response
+    except Exception:
+        wav_file.close()
+        raise
+
+
+# parameter sweep: {grid, step_len, loops, param, values: [...] or {start, stop, count}}
+# -> one WAV with a channel per value (same order, listed in the X-Sweep-Values header)
+@audio_bp.route('/audio/sweep', methods=['POST'])
+def generate_sweep():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Missing data"}), 400
+    sample_rate = PREVIEW_SAMPLERATE if request.args.get('quality') == 'preview' else SAMPLERATE
+    sample_format = request.args.get('format', 'int16')
+    if sample_format not in SAMPLE_FORMATS:
+        return jsonify({"error": "Invalid format"}), 400
+    try:
+        grid = [None if step is None else tuple(step) for step in data.get('grid', [])]
+        step_len = float(data.get('step_len', 0.5))
+        num_loops = max(1, int(data.get('loops', 1)))
+        values = data.get('values')
+        if isinstance(values, dict):
+            values = np.linspace(float(values['start']), float(values['stop']), int(values['count']))
+        values = np.asarray(values, dtype=np.float64)
+
+        synth = current_app.synth
+        with params_lock:
+            sound = synth.sound.copy()
+        budget = current_app.renderBudget # same budget as /audio: every variant of the batch counts
+        budget.admit(len(grid), step_len, num_loops, sound.getReleaseAmp() * 0.001, sample_rate,
+                     batchSize=len(values))
+        with budget.slot(_session_id()):
+            start = time.perf_counter()
+            sig = BatchSynthesiser.sweep(sound, data.get('param'), values, grid, step_len,
+                                         synth.getMaxVoices(), sample_rate, num_loops)
+            observeRender(time.perf_counter() - start, sig.size, sample_rate, "sweep") # every variant counts
+    except RenderRejected as e:
+        return jsonify({"error": str(e)}), e.status
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid sweep request: {e}"}), 400
+
+    print(f"[SWEEP] {data.get('param')}: {sig.shape[0]} values, {sig.shape[1]} samples")
+    response = send_file(WavWriter.encode(sig.T, sample_rate, sample_format), mimetype='audio/wav',
+                         as_attachment=True, download_name=f"Fm_sweep_{data.get('param')}.wav")
+    descriptor = PARAMS.byId(data.get('param'))
+    response.headers['X-Sweep-Values'] = json.dumps(np.clip(values, descriptor.minimum, descriptor.maximum).tolist())
+    return response
+
+
+# render queue depth and budget (latency under load)
+@audio_bp.route('/audio/queue')
+def render_queue():
+    budget = current_app.renderBudget
+    return jsonify({**budget.getStats(), "limits": budget.getLimits()}), 200
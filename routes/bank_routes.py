@@ -0,0 +1,54 @@
+# bulk audition of a preset bank: one standard phrase rendered with every preset (in parallel, cached by preset hash)
+#
+#   POST /api/bank/audition        {names: [...] (optional, default: whole bank)}
+#                                  -> [{name, hash, duration, overview: {min, max}}]
+#   GET  /api/bank/audition/<hash> -> WAV of a rendered clip
+
+from flask import Blueprint, jsonify, send_file, current_app, request
+import time
+from synth.class_WavWriter import WavWriter
+
+bank_bp = Blueprint('bank_bp', __name__)
+
+
+@bank_bp.route('/bank/audition', methods=['POST'])
+def audition_bank():
+    data = request.get_json(silent=True) or {}
+    names = data.get('names')
+    if names is not None and not isinstance(names, list):
+        return jsonify({"error": "names must be a list"}), 400
+    try:
+        auditioner = current_app.auditioner
+        store = current_app.synth.preset.getStore()
+    except AttributeError:
+        print("ERROR: Unable to connect to app.auditioner.")
+        return jsonify({"error": "Server error"}), 500
+
+    start = time.perf_counter()
+    try:
+        clips = auditioner.auditionStore(store, names)
+    except KeyError as e:
+        return jsonify({"error": f"Preset {e} not found"}), 404
+    elapsed = time.perf_counter() - start
+    print(f"[BANK] {len(clips)} presets auditioned in {elapsed:.2f} s")
+
+    result = [{"name": clip.name,
+               "hash": f"{clip.hash:016x}",
+               "duration": len(clip.audio) / clip.sample_rate,
+               "overview": {"min": clip.overview[0].round(4).tolist(), "max": clip.overview[1].round(4).tolist()}}
+              for clip in clips.values()]
+    return jsonify({"clips": result, "seconds": round(elapsed, 3), "stats": auditioner.getStats()}), 200
+
+
+@bank_bp.route('/bank/audition/<clip_hash>', methods=['GET'])
+def get_audition_clip(clip_hash):
+    try:
+        key = int(clip_hash, 16)
+    except ValueError:
+        return jsonify({"error": "Invalid hash"}), 400
+    auditioner = current_app.auditioner
+    clip = auditioner.getClip(key)
+    if clip is None:
+        return jsonify({"error": "Clip not rendered (POST /api/bank/audition first)"}), 404
+    audio, _ = clip
+    return send_file(WavWriter.encode(audio, auditioner.getSampleRate()), mimetype='audio/wav')
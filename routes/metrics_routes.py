@@ -0,0 +1,56 @@
+# Prometheus-style metrics of the synthesis engine and of the HTTP hot paths
+#
+#   GET /metrics   -> text exposition format (counters, gauges, histograms)
+#
+# engine counters are updated once per rendered block (synth/class_Metrics.py), request durations and
+# WAV bytes served by the hooks below; cache and queue gauges are read when /metrics is scraped
+
+from flask import Blueprint, Response, current_app, request, g
+import time
+from synth.class_Metrics import METRICS, HTTP_SECONDS, WAV_BYTES
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+CACHE_HITS = METRICS.gauge("fm_cache_hits", "Cache hits, by cache")
+CACHE_MISSES = METRICS.gauge("fm_cache_misses", "Cache misses (renders), by cache")
+CACHE_HIT_RATIO = METRICS.gauge("fm_cache_hit_ratio", "Hits / (hits + misses), by cache")
+QUEUE_DEPTH = METRICS.gauge("fm_render_queue_depth", "Renders waiting for a slot of the render budget")
+RENDERS_RUNNING = METRICS.gauge("fm_renders_running", "Renders holding a slot of the render budget")
+
+
+@metrics_bp.before_app_request
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+@metrics_bp.after_app_request
+def _observe_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None and request.endpoint != 'metrics_bp.metrics':
+        HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or "unknown")
+    if response.mimetype == 'audio/wav' and response.content_length:
+        WAV_BYTES.inc(response.content_length)
+    return response
+
+
+def _set_cache(name, hits, misses):
+    CACHE_HITS.set(hits, cache=name)
+    CACHE_MISSES.set(misses, cache=name)
+    CACHE_HIT_RATIO.set(hits / (hits + misses) if hits + misses else 0.0, cache=name)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    prerenderer = getattr(current_app, "prerenderer", None)
+    if prerenderer is not None:
+        stats = prerenderer.getStats()
+        _set_cache("prerender", stats["hits"], stats["misses"])
+    auditioner = getattr(current_app, "auditioner", None)
+    if auditioner is not None:
+        stats = auditioner.getStats()
+        _set_cache("bank_audition", stats["hits"], stats["rendered"])
+    budget = getattr(current_app, "renderBudget", None)
+    if budget is not None:
+        stats = budget.getStats()
+        QUEUE_DEPTH.set(stats["queued"])
+        RENDERS_RUNNING.set(stats["running"])
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,156 @@
+# live audition channel: parameter deltas go upstream, PCM blocks come downstream as they are rendered
+#
+#   POST   /stream        {grid, step_len}   -> opens a stream, returns its id and audio format
+#   GET    /stream/<id>   Server-Sent Events: "format", "version" and "audio" (base64 int16 PCM) events
+#   POST   /stream/<id>   {updates: [...]}   -> parameter deltas (same format as /api/params)
+#   DELETE /stream/<id>                      -> closes the stream
+#
+# every stream has its own engine sharing app.synth.sound, so knob changes are heard from the next block
+
+from flask import Blueprint, Response, jsonify, current_app, request
+import base64
+import itertools
+import json
+import threading
+import time
+from routes.api_routes import params_lock
+from synth.class_ParamRegistry import PARAMS
+from synth.class_Synthesiser import Synthesiser
+from synth.class_AudioStream import AudioStream
+from synth.class_Metrics import PARAM_UPDATES
+
+stream_bp = Blueprint('stream_bp', __name__)
+
+SAMPLERATE = 44100
+MAX_STREAMS = 2         # streams rendered at the same time
+LEAD_BLOCKS = 2         # blocks rendered ahead of real time (latency of a knob change)
+UNREAD_TIMEOUT = 10.0   # seconds an opened stream keeps its slot before its GET arrives
+
+_streams = {}           # id -> AudioStream
+_unread = {}            # id -> time opened, for the streams not read yet
+_reading = set()        # ids with a GET in progress
+_streams_lock = threading.Lock()
+_ids = itertools.count(1)
+
+
+def _parse_grid(raw_grid):
+    """ frontend grid (lists of midi notes or null) -> sequencer steps """
+    return [None if step is None else tuple(step) for step in raw_grid]
+
+def _sse(event, data) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+def _expire_unread() -> None:
+    """ frees the slots of the streams never read within UNREAD_TIMEOUT (call with _streams_lock held) """
+    now = time.monotonic()
+    for stream_id, opened in list(_unread.items()):
+        if now - opened > UNREAD_TIMEOUT:
+            del _unread[stream_id]
+            _streams.pop(stream_id, None)
+            print(f"[STREAM] {stream_id} expired (never read)")
+
+
+@stream_bp.route('/stream', methods=['POST'])
+def open_stream():
+    try:
+        data = request.get_json()
+        grid = _parse_grid(data.get('grid', []))
+        step_len = float(data.get('step_len', 0.5))
+        synth = current_app.synth
+        engine = Synthesiser(numVoices=synth.getMaxVoices(), sample_rate=SAMPLERATE,
+                             sound=synth.sound)
+        stream = AudioStream(engine, grid, step_len)
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid stream request: {e}"}), 400
+
+    with _streams_lock:
+        _expire_unread()
+        if len(_streams) >= MAX_STREAMS:
+            return jsonify({"error": "Too many open streams"}), 503
+        stream_id = str(next(_ids))
+        _streams[stream_id] = stream
+        _unread[stream_id] = time.monotonic()
+    print(f"[STREAM] {stream_id} opened ({len(grid)} steps)")
+    return jsonify({"id": stream_id, "sample_rate": SAMPLERATE, "block_size": stream.getBlockSize(),
+                    "encoding": "pcm_s16le"}), 200
+
+
+@stream_bp.route('/stream/<stream_id>', methods=['GET'])
+def read_stream(stream_id):
+    with _streams_lock:
+        stream = _streams.get(stream_id)
+        if stream is None:
+            return jsonify({"error": "Unknown stream"}), 404
+        if stream_id in _reading: # one reader per stream: a second one would advance the same engine
+            return jsonify({"error": "Stream already being read"}), 409
+        _reading.add(stream_id)
+        _unread.pop(stream_id, None)
+    sound = stream.synth.sound
+
+    def release():
+        with _streams_lock:
+            _reading.discard(stream_id)
+            if _streams.get(stream_id) is stream:
+                del _streams[stream_id]
+
+    def events():
+        yield _sse("format", json.dumps({"sample_rate": stream.getSampleRate(), "block_size": stream.getBlockSize(),
+                                         "encoding": "pcm_s16le"}))
+        block_time = stream.getBlockSize() / stream.getSampleRate()
+        start = time.monotonic()
+        version = None
+        try:
+            while _streams.get(stream_id) is stream:
+                with params_lock: # parameter batches are applied between two blocks
+                    changed = sound.getVersion() != version
+                    version = sound.getVersion()
+                    block = stream.nextBlock()
+                if changed:
+                    yield _sse("version", version)
+                yield _sse("audio", base64.b64encode(AudioStream.toPcm16(block)).decode("ascii"))
+                # don't render more than LEAD_BLOCKS ahead of the client
+                ahead = stream.getBlockCount() * block_time - (time.monotonic() - start)
+                if ahead > LEAD_BLOCKS * block_time:
+                    time.sleep(ahead - LEAD_BLOCKS * block_time)
+        finally: # client gone or stream closed
+            release()
+            print(f"[STREAM] {stream_id} closed after {stream.getBlockCount()} blocks")
+
+    response = Response(events(), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(release) # also when the client leaves before the first event
+    return response
+
+
+@stream_bp.route('/stream/<stream_id>', methods=['POST'])
+def update_stream(stream_id):
+    stream = _streams.get(stream_id)
+    if stream is None:
+        return jsonify({"error": "Unknown stream"}), 404
+    try:
+        data = request.get_json()
+        updates = data.get('updates') if isinstance(data, dict) else data
+        if not isinstance(updates, list):
+            return jsonify({"error": "Missing data: a list of updates expected"}), 400
+        with params_lock:
+            applied = PARAMS.applyUpdates(stream.synth.sound, updates)
+            version = stream.synth.sound.getVersion()
+        PARAM_UPDATES.inc(len(applied))
+        current_app.prerenderer.schedule()
+        # heard from the next rendered block
+        return jsonify({"status": "ok", "applied": len(applied), "version": version,
+                        "block": stream.getBlockCount()})
+    except KeyError as e:
+        return jsonify({"error": f"Parameter {e} not mapped"}), 400
+    except (ValueError, TypeError, AttributeError):
+        return jsonify({"error": "Invalid parameter value"}), 400
+
+
+@stream_bp.route('/stream/<stream_id>', methods=['DELETE'])
+def close_stream(stream_id):
+    with _streams_lock:
+        stream = _streams.pop(stream_id, None)
+        _unread.pop(stream_id, None)
+    if stream is None:
+        return jsonify({"error": "Unknown stream"}), 404
+    return jsonify({"status": "closed", "blocks": stream.getBlockCount()})
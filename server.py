@@ -1,12 +1,21 @@
 from flask import Flask
 from routes.audio_routes import audio_bp
-from routes.api_routes import api_bp
+from routes.api_routes import api_bp, params_lock
+from routes.stream_routes import stream_bp
+from routes.bank_routes import bank_bp
+from routes.metrics_routes import metrics_bp
 from synth.class_Synthesiser import Synthesiser
+from synth.class_PreRenderer import PreRenderer
+from synth.class_BankAuditioner import BankAuditioner
+from synth.class_RenderBudget import RenderBudget
 
 app = Flask(__name__, static_folder="static")
 
 try:
     app.synth = Synthesiser(numVoices=6)
+    app.prerenderer = PreRenderer(app.synth, lock=params_lock) # background renders of the audition
+    app.auditioner = BankAuditioner(numVoices=app.synth.getMaxVoices()) # bulk preset auditions (process pool)
+    app.renderBudget = RenderBudget() # admission control of the /audio renders
     print("✅ Synthesizer initialized correctly")
 except Exception as e:
     print(f"❌ ERROR WHILE INITIALIZING THE SYNTHESIZER: {e}")
@@ -14,6 +23,9 @@ except Exception as e:
 
 app.register_blueprint(audio_bp)
 app.register_blueprint(api_bp, url_prefix='/api')
+app.register_blueprint(stream_bp)
+app.register_blueprint(bank_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp)
 
 
 @app.route("/")
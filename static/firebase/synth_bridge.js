@@ -46,56 +46,29 @@ export async function handleSavePreset() {
 
 
 // Parameters map. Python:html_ID
-const PARAM_MAP = {
-    "Algorithm": "algorithm",
-    //"Amp": not visible to user
-    "AttackA": 'attack_A',
-    "AttackAmp": 'attack_amp',
-    "AttackB1": 'attack_B1',
-    "AttackB2": 'attack_B2',
-    "DecayA": 'decay_A',
-    "DecayAmp": 'decay_amp',
-    "DecayB1": 'decay_B1',
-    "DecayB2": 'decay_B2',
-    "EnvAmount": 'envamt',
-    "EnvDestination": 'envdest',
-    "EnvRelease": 'envrelease',
-    "FeedbackA": 'feedback_A',
-    "FeedbackB1": 'feedback_B1',
-    "FeedbackB2": 'feedback_B2',
-    "FeedbackC": 'feedback_C',
-    "LevA": 'level_A',
-    "LevB1": 'level_B1',
-    "LevB2": 'level_B2',
-    "Lfo1Params": 'lfo1',
-    "Lfo2Params": 'lfo2',
-    "Lfo3Params": 'lfo3',
-    "MasterVolume": 'master_vol',
-    "Mix": 'mix',
-    "RatioA": 'ratio_A',
-    "RatioB1": 'ratio_B1',
-    "RatioB2": 'ratio_B2',
-    "RatioC": 'ratio_C',
-    "ReleaseA": 'release_A',
-    "ReleaseAmp": 'release_amp',
-    "ReleaseB1": 'release_B1',
-    "ReleaseB2": 'release_B2',
-    "SustainA": 'sustain_A',
-    "SustainAmp": 'sustain_amp',
-    "SustainB1": 'sustain_B1',
-    "SustainB2": 'sustain_B2',
-    };
+// served once by the parameter registry (synth/class_ParamRegistry.py)
+let PARAM_MAP = null;
+
+async function getParamMap() {
+    if (!PARAM_MAP) {
+        const response = await fetch('/api/synth/params');
+        if (!response.ok) { throw new Error("Error in Python answer"); }
+        PARAM_MAP = (await response.json()).preset_map;
+    }
+    return PARAM_MAP;
+}
 
 
 // apply preset data to frontend (and backend consequently)
-function applyPresetState(presetData) {
+async function applyPresetState(presetData) {
     console.log("setting Preset Data:", presetData);
+    const paramMap = await getParamMap();
 
     const lfoSuffixes = ["dest", "amt", "rate", "wave", "smooth"];
 
     for (const [pythonKey, value] of Object.entries(presetData)) {
         
-        const htmlId = PARAM_MAP[pythonKey]; // HTML id to change the object value
+        const htmlId = paramMap[pythonKey]; // HTML id to change the object value
 
         if (!htmlId) { continue; }
 
@@ -144,7 +117,7 @@ export async function handleLoadPreset() {
         if (choice !== null && presets[choice]) {
             const selectedData = presets[choice].data; //preset values dictionary
 
-            applyPresetState(selectedData);
+            await applyPresetState(selectedData);
         }
     } catch (e) {
         console.error("Error while loading preset:", e);
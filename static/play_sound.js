@@ -7,6 +7,8 @@ async function playSound() {
     playButton.textContent = 'Loading';
     playButton.onclick = playSound; 
 
+    await flushParams(); // make sure the last knob changes reached the server
+
     let slicedGrid = sequencer_status.slice(0); 
 
     // CLEANING AND OFFSET
@@ -29,7 +31,8 @@ async function playSound() {
     const jsonString = JSON.stringify(payload);
     const encodedData = encodeURIComponent(jsonString);
 
-    audio.src = `/audio?t=${new Date().getTime()}&data=${encodedData}`;
+    // preview quality: rendered at a lower sample rate (faster), the browser resamples it
+    audio.src = `/audio?t=${new Date().getTime()}&data=${encodedData}&quality=preview`;
 
     try {
         await audio.play();
@@ -103,6 +106,7 @@ async function exportAudio(btn) {
     btn.style.cursor = "wait";
 
     try {
+        await flushParams();
         let slicedGrid = sequencer_status.slice(0);
         
         const OCTAVE_OFFSET = 12; 
@@ -0,0 +1,78 @@
+// LIVE AUDITION
+// the sequence loops on the server and arrives block by block (../routes/stream_routes.py):
+// knob changes are sent through the stream and heard from the next block, without pressing Play again
+const liveButton = document.getElementById('liveButton');
+const LIVE_START_DELAY = 0.1; // seconds buffered before the first block is played
+
+let liveStream = null; // { id, source, context, nextTime }
+
+async function startLiveStream() {
+    if (liveStream) return;
+    liveButton.disabled = true;
+    await flushParams();
+
+    // same grid as playSound()
+    const OCTAVE_OFFSET = 12;
+    let slicedGrid = sequencer_status.slice(0).map(step => {
+        if (!step || step.length === 0) return null;
+        return step.map(noteNumber => noteNumber + OCTAVE_OFFSET)
+    });
+    while (slicedGrid.length > 0 && slicedGrid[slicedGrid.length - 1] === null) {
+        slicedGrid.pop();
+    }
+
+    try {
+        const response = await fetch('/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ grid: slicedGrid, step_len: parseFloat(step_len) })
+        });
+        const info = await response.json();
+        if (!response.ok) throw new Error(info.error);
+
+        const context = new AudioContext({ sampleRate: info.sample_rate });
+        liveStream = { id: info.id, source: new EventSource(`/stream/${info.id}`), context: context, nextTime: 0 };
+        liveStream.source.addEventListener('audio', (e) => playBlock(e.data));
+        liveStream.source.onerror = () => stopLiveStream();
+        paramsEndpoint = `/stream/${info.id}`;
+
+        liveButton.textContent = 'Stop Live';
+        liveButton.onclick = stopLiveStream;
+    } catch (error) {
+        console.error("Live stream error:", error);
+    } finally {
+        liveButton.disabled = false;
+    }
+}
+
+// base64 int16 PCM -> AudioBuffer scheduled right after the previous block
+function playBlock(data) {
+    if (!liveStream) return;
+    const bytes = Uint8Array.from(atob(data), c => c.charCodeAt(0));
+    const pcm = new Int16Array(bytes.buffer);
+    const context = liveStream.context;
+    const buffer = context.createBuffer(1, pcm.length, context.sampleRate);
+    const channel = buffer.getChannelData(0);
+    for (let i = 0; i < pcm.length; i++) channel[i] = pcm[i] / 32768;
+
+    const node = context.createBufferSource();
+    node.buffer = buffer;
+    node.connect(context.destination);
+    liveStream.nextTime = Math.max(liveStream.nextTime, context.currentTime + LIVE_START_DELAY);
+    node.start(liveStream.nextTime);
+    liveStream.nextTime += buffer.duration;
+}
+
+async function stopLiveStream() {
+    if (!liveStream) return;
+    const stream = liveStream;
+    liveStream = null;
+    await flushParams(); // pending updates still go to the stream
+    paramsEndpoint = '/api/params';
+    stream.source.close();
+    stream.context.close();
+    fetch(`/stream/${stream.id}`, { method: 'DELETE' }).catch(() => {});
+
+    liveButton.textContent = 'Live';
+    liveButton.onclick = startLiveStream;
+}
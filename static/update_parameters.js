@@ -1,64 +1,62 @@
 // every parameter's setter function pass from here and goes to python
 
-// float generic parameters
-async function sendParam(paramName, value) {
-    console.log(`Updating: ${paramName} -> ${value}`);
+// knob drags fire many changes per second: updates are queued and sent together to /api/params
+// (only the last value of each parameter is kept)
+const FLUSH_DELAY_MS = 30;
+const pendingParams = new Map();
+let flushTimer = null;
+let lastFlush = Promise.resolve();
+let paramsEndpoint = '/api/params'; // the live stream (stream_audio.js) sends updates through its own channel
 
-    try {
-        // function defined in ../routes/api_routes.py
-        const response = await fetch('/api/update-param', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            // standard json: { "name": "...", "value": ... }
-            body: JSON.stringify({ 
-                name: paramName, 
-                value: value 
-            })
-        });
+// names used by sendEnvParam -> parameter id
+const ENV_PARAM_IDS = { dest: 'envdest', amount: 'envamt', release: 'envrelease' };
 
-        if (!response.ok) throw new Error(response.statusText);
-    } catch (error) {
-        console.error("sync error:", error);
+function queueParam(update) {
+    const key = update.lfoIndex === undefined ? update.name : `${update.name}@${update.lfoIndex}`;
+    pendingParams.delete(key); // coalesce: keep only the last value
+    pendingParams.set(key, update);
+    if (flushTimer === null) {
+        flushTimer = setTimeout(flushParams, FLUSH_DELAY_MS);
     }
 }
 
-// lfos parameters
-async function sendLfoParam(paramName, value, lfoIndex) {
-    console.log(`Updating: ${paramName} -> ${value}. lfo index${lfoIndex}`);
-    try {
-        const response = await fetch('/api/update-lfo-param', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ 
-                name: paramName, 
-                value: value,
-                lfoIndex: lfoIndex
-            })
-        });
+// sends the queued updates. resolves once every update sent so far has been applied
+function flushParams() {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+    if (pendingParams.size === 0) return lastFlush;
 
-        if (!response.ok) throw new Error(response.statusText);
-    } catch (error) {
-        console.error("sync error:", error);
-    }
+    const updates = Array.from(pendingParams.values());
+    pendingParams.clear();
+    lastFlush = lastFlush.then(async () => {
+        try {
+            // functions defined in ../routes/api_routes.py and ../routes/stream_routes.py
+            const response = await fetch(paramsEndpoint, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ updates: updates })
+            });
+            if (!response.ok) throw new Error(response.statusText);
+        } catch (error) {
+            console.error("sync error:", error);
+        }
+    });
+    return lastFlush;
 }
 
-// exponential envelope parameters
-async function sendEnvParam(paramName, value) {
-    console.log(`Updating: ${paramName} -> ${value}.`);
-    try {
-        const response = await fetch('/api/update-env-param', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ 
-                name: paramName, 
-                value: value,
-            })
-        });
+// float generic parameters
+function sendParam(paramName, value) {
+    queueParam({ name: paramName, value: value });
+}
 
-        if (!response.ok) throw new Error(response.statusText);
-    } catch (error) {
-        console.error("sync error:", error);
-    }
+// lfos parameters
+function sendLfoParam(paramName, value, lfoIndex) {
+    queueParam({ name: paramName, value: value, lfoIndex: lfoIndex });
+}
+
+// exponential envelope parameters
+function sendEnvParam(paramName, value) {
+    queueParam({ name: ENV_PARAM_IDS[paramName], value: value });
 }
 
 // specific for algorithm parameter (int)
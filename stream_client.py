@@ -0,0 +1,89 @@
+"""
+Local test client for the live audition channel (routes/stream_routes.py).
+
+Opens a stream on a running server, reads the PCM blocks, sends a parameter change in the middle
+and reports after how many blocks the new sound version came back, plus the render speed.
+
+    python server.py
+    python stream_client.py --blocks 40 --param mix --value 0.9 --wav stream.wav
+"""
+import argparse
+import base64
+import json
+import time
+import urllib.request
+import wave
+
+
+def request_json(url, method="GET", payload=None):
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as response:
+        return json.loads(response.read())
+
+
+def read_events(response):
+    """ yields (event, data) from a Server-Sent Events response """
+    event, data = None, []
+    for raw in response:
+        line = raw.decode().rstrip("\n")
+        if not line:
+            if event is not None:
+                yield event, "\n".join(data)
+            event, data = None, []
+        elif line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            data.append(line[6:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FM synth stream test client")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--grid", default="[[60], [64, 67], null, [72]]", help="JSON list of steps")
+    parser.add_argument("--step-len", type=float, default=0.25)
+    parser.add_argument("--blocks", type=int, default=40, help="blocks to read before closing")
+    parser.add_argument("--param", default="mix", help="parameter changed halfway (id from /api/synth/params)")
+    parser.add_argument("--value", default="0.9")
+    parser.add_argument("--wav", default=None, help="optional: writes the received audio")
+    args = parser.parse_args()
+
+    info = request_json(f"{args.url}/stream", "POST", {"grid": json.loads(args.grid), "step_len": args.step_len})
+    stream_url = f"{args.url}/stream/{info['id']}"
+    print(f"stream {info['id']}: {info['sample_rate']} Hz, {info['block_size']} samples per block")
+
+    pcm = bytearray()
+    blocks = 0
+    sent_at = None      # block count when the change was sent
+    sent_version = None
+    start = time.monotonic()
+    with urllib.request.urlopen(stream_url) as response:
+        for event, data in read_events(response):
+            if event == "version" and sent_version is not None and int(data) >= sent_version:
+                print(f"version {data} heard {blocks + 1 - sent_at} block(s) after the change")
+                sent_version = None
+            elif event == "audio":
+                pcm += base64.b64decode(data)
+                blocks += 1
+                if blocks == args.blocks // 2:
+                    reply = request_json(stream_url, "POST", {"updates": [{"name": args.param, "value": args.value}]})
+                    sent_at, sent_version = blocks, reply["version"]
+                    print(f"sent {args.param}={args.value} (version {sent_version})")
+                if blocks >= args.blocks:
+                    break
+    elapsed = time.monotonic() - start
+    request_json(stream_url, "DELETE")
+
+    seconds = len(pcm) / 2 / info["sample_rate"]
+    print(f"received {blocks} blocks ({seconds:.2f} s of audio) in {elapsed:.2f} s")
+    if args.wav:
+        with wave.open(args.wav, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(info["sample_rate"])
+            wf.writeframes(bytes(pcm))
+        print(f"written {args.wav}")
+
+
+if __name__ == "__main__":
+    main()
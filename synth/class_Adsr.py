@@ -8,8 +8,8 @@ class Adsr:
 
     def __init__(self, attack=10.0, decay=100.0, sustain=0.7, release=200.0, amplitude=1.0, sample_rate=44100):
         self._sr = sample_rate
-        self._sr_ms_smp = int(self._sr*0.001) #to get from ms to samples
-        self._sr_smp_ms = self._sr*1000 #to get from samples to ms
+        self._sr_ms_smp = self._sr*0.001 #to get from ms to samples
+        self._sr_smp_ms = 1000/self._sr #to get from samples to ms
         
         # times (in samples)
         self._attack = 0
@@ -23,9 +23,14 @@ class Adsr:
         self._phase = "idle"
         self._value = 0.0
         self._index = 0
-        self._gate_countdown = None
+        self._release_start = 0.0
         self.setParams(attack, decay, sustain, release)
 
+    @staticmethod
+    def msToSamples(ms: float, sample_rate: int) -> int:
+        """Converts a time parameter from milliseconds to samples (as the setters do, min 1 sample)"""
+        return max(int(sample_rate*0.001 * ms), 1)
+
     def _msecToSmp(self, ms: float) -> int:
         """Converts value from milliseconds to samples"""
         return int(self._sr_ms_smp * ms) #sr*0.001 *milliseconds
@@ -80,34 +85,53 @@ class Adsr:
         """returns max amplitude of the ADSR"""
         return self._amplitude
 
-    def setGate(self, gate: bool, numSamples: int = None):
+    def setGate(self, gate: bool):
         """ Sets the gate (ON=True, OFF=False). 
-        if numSamples is specified, the gate will be turned off automatically and release will start.
-        Otherwise it must be done manually """
+        the release starts when the gate is turned off (see Synthesiser.noteOn to schedule it) """
         if gate and not self._gate: # start
             self._gate = True
             self._phase = "attack"
             self._index = 0
-            self._gate_countdown = None if numSamples is None else numSamples
         elif not gate and self._gate: # release
             self._gate = False
             self._phase = "release"
             self._index = 0
-            self._gate_countdown = None
 
     def isPlaying(self):
         return self._phase != "idle"
 
+    def isReleasing(self):
+        """returns True if the envelope is fading out towards idle"""
+        return self._phase == "release"
+
+    def getLevel(self):
+        """returns the absolute value of the last computed sample"""
+        return abs(self._value * self._amplitude)
+
+    def getRemainingSamples(self, gateSamples: int = None):
+        """returns the exact number of samples before the envelope goes idle.
+        gateSamples: samples left before the gate is turned off.
+        None if the gate is held and gateSamples is unknown"""
+        if self._phase == "idle":
+            return 0
+        if self._phase == "release":
+            return self._release - self._index
+        if not self._gate: # sustain reached with gate already closed
+            return 1 + self._release
+        if gateSamples is None:
+            return None
+        return gateSamples + self._release
+
+    def getState(self) -> tuple:
+        """returns the running state of the envelope (used to compare engine states)"""
+        return (self._gate, self._phase, self._value, self._index, 
+                self._release_start, self._amplitude)
+
     def getSample(self):
         """ Returns next ADSR sample (remember to setGate before) """
         if not self.isPlaying():
             return 0.0
 
-        if self._gate_countdown is not None:
-            self._gate_countdown -= 1
-            if self._gate_countdown <= 0:
-                self.setGate(False)
-                self._gate_countdown = None
         # Attack
         if self._phase == "attack":
             self._value = (self._index / max(1, self._attack))
@@ -0,0 +1,71 @@
+import math
+import numpy as np
+
+STREAM_BLOCK_SIZE = 2048 # samples sent in each block (~46 ms at 44.1 kHz)
+
+
+class AudioStream:
+    """ Renders a looping sequence block by block, for streaming to a client while it plays.
+    Parameter changes made on synth.sound between two blocks are heard from the next block.
+
+    The whole signal isn't known in advance, so it can't be normalized by its peak like
+    Sequencer.create_sequence does: blocks are divided by the running peak instead
+    (the gain only decreases, so nothing clips and the level converges to the offline one).
+
+    *Example usage*
+    -----------------
+    >>> stream = AudioStream(synth, ["C4", None, ("E4", "G4")], step_len=0.25)
+    >>> block = stream.nextBlock()     # float block in [-1, 1]
+    >>> pcm = stream.toPcm16(block)    # little-endian int16 bytes
+    """
+    def __init__(self, synth, sequence:list, step_len:float, blockSize:int=STREAM_BLOCK_SIZE):
+        self.synth = synth
+        synth.setMetricsKind("stream")
+        self._sr = synth.getSampleRate()
+        self._blockSize = blockSize
+        if not math.isfinite(step_len * self._sr): # inf, nan, or too long to be counted in samples
+            raise ValueError(f"AudioStream: invalid step length {step_len}")
+        step_samples = int(step_len * self._sr)
+        self._loopLen = step_samples * len(sequence)
+        if self._loopLen <= 0:
+            raise ValueError("AudioStream: the sequence must last at least one sample")
+        self._timeline = synth.sequencer.compile_sequence(sequence, step_samples)
+        self._loopPos = 0       # position inside the current loop
+        self._blocks = 0        # blocks rendered so far
+        self._peak = 0.0        # running peak (normalization)
+
+    def getSampleRate(self) -> int:
+        return self._sr
+
+    def getBlockSize(self) -> int:
+        return self._blockSize
+
+    def getBlockCount(self) -> int:
+        return self._blocks
+
+    def nextBlock(self) -> np.ndarray:
+        """ renders the next block of the loop (events of a new loop are scheduled at its start) """
+        parts = []
+        remaining = self._blockSize
+        while remaining > 0:
+            n = min(remaining, self._loopLen - self._loopPos)
+            if self._loopPos == 0:
+                parts.append(self.synth.renderTimeline(self._timeline, n))
+            else:
+                parts.append(self.synth.render(n))
+            self._loopPos = (self._loopPos + n) % self._loopLen
+            remaining -= n
+        block = np.concatenate(parts) if len(parts) > 1 else np.array(parts[0])
+        self._blocks += 1
+
+        # RUNNING NORMALIZATION
+        block = np.nan_to_num(block, nan=0.0, posinf=1.0, neginf=-1.0)
+        self._peak = max(self._peak, float(np.max(np.abs(block))))
+        if self._peak > 0:
+            block = block / self._peak * self.synth.sound.getMasterVolume()
+        return block
+
+    @staticmethod
+    def toPcm16(block:np.ndarray) -> bytes:
+        """ float block -> little-endian 16 bit PCM """
+        return (np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes()
@@ -0,0 +1,179 @@
+from .class_Synthesiser import Synthesiser
+from .class_SynthesiserSound import SynthesiserSound
+from .class_PresetManager import PresetManager
+from .class_PackedSound import PackedSound
+from .class_PresetStore import PresetStore
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+import multiprocessing
+import os
+import threading
+import numpy as np
+
+AUDITION_PHRASE = ["C3", ("C4", "E4", "G4")]   # standard phrase played by every preset
+AUDITION_STEP_LEN = 0.4                         # seconds
+AUDITION_SAMPLERATE = 22050                     # preview quality (half the synthesis cost)
+OVERVIEW_POINTS = 256                           # columns of a waveform overview
+CLIP_CACHE_SIZE = 512                           # clips kept in memory (about 100 kB each)
+
+
+@dataclass(frozen=True)
+class AuditionClip:
+    """ audition of one preset.
+     * hash     : PackedSound.contentHash() of the preset (equal settings share one clip)
+     * audio    : float32 signal, normalized like create_sequence
+     * overview : (2, OVERVIEW_POINTS) float32 array of min/max values per column """
+    name: str
+    hash: int
+    sample_rate: int
+    audio: np.ndarray
+    overview: np.ndarray
+
+
+def presetToPacked(params:dict) -> PackedSound:
+    """ preset dictionary (PresetStore / params_to_dict format) -> PackedSound """
+    sound = SynthesiserSound()
+    PresetManager(sound).dict_to_params(params)
+    return sound.pack()
+
+def waveformOverview(sig:np.ndarray, points:int=OVERVIEW_POINTS) -> np.ndarray:
+    """ returns the (min, max) envelope of sig in 'points' columns, shape (2, points) """
+    overview = np.zeros((2, points), dtype=np.float32)
+    if sig.size == 0:
+        return overview
+    columns = -(-len(sig) // points) # ceil
+    padded = np.zeros(columns * points, dtype=np.float32)
+    padded[:len(sig)] = sig
+    padded = padded.reshape(points, columns)
+    np.min(padded, axis=1, out=overview[0])
+    np.max(padded, axis=1, out=overview[1])
+    return overview
+
+def _render_clip(job:tuple) -> tuple:
+    """ worker: (packed bytes, sequence, step_len, sample_rate, numVoices, points) -> (audio, overview).
+    module level so a process pool can call it """
+    packed_bytes, sequence, step_len, sample_rate, numVoices, points = job
+    sound = PackedSound.fromBytes(packed_bytes).toSound(sample_rate)
+    engine = Synthesiser(numVoices=numVoices, sample_rate=sample_rate, sound=sound)
+    audio = engine.sequencer.create_sequence(sequence, step_len, dtype=np.float32)
+    return audio, waveformOverview(audio, points)
+
+
+class BankAuditioner:
+    """ Renders the same short phrase with many presets of a bank, in parallel.
+
+    Every preset is packed (PackedSound) and its content hash is the cache key, so renamed or duplicated
+    presets are rendered once and a bank is rendered again only for the presets that changed.
+    The missing clips are rendered by a pool of worker processes (the engine is pure Python, so
+    processes, not threads, use all the cores); each job crosses the process boundary as the packed
+    bytes of the preset (a few hundred bytes). Every clip comes with a waveform overview for the UI.
+
+    *Example usage*
+    -----------------
+    >>> auditioner = BankAuditioner()
+    >>> clips = auditioner.auditionStore(PresetStore("./FmSynth_presets.jsonl"))
+    >>> clips["bell"].overview.shape          # (2, 256)
+    >>> auditioner.close()                    # stops the worker processes
+    """
+    def __init__(self, numVoices:int=6, sequence:list=None, step_len:float=AUDITION_STEP_LEN,
+                 sample_rate:int=AUDITION_SAMPLERATE, workers:int=None, cacheSize:int=CLIP_CACHE_SIZE):
+        """ workers: number of processes (default: every core). 1 renders in the calling process """
+        self._numVoices = numVoices
+        self._sequence = list(AUDITION_PHRASE if sequence is None else sequence)
+        self._step_len = step_len
+        self._sr = sample_rate
+        self._workers = (os.cpu_count() or 1) if workers is None else max(1, workers)
+        self._cacheSize = cacheSize
+        self._cache = OrderedDict()     # hash -> (audio, overview), least recently used first
+        self._lock = threading.Lock()   # guards cache and pool
+        self._pool:ProcessPoolExecutor = None
+        # statistics
+        self._hits = self._rendered = 0
+
+    def getSampleRate(self) -> int:
+        return self._sr
+
+    def getStats(self) -> dict:
+        return {"hits": self._hits, "rendered": self._rendered, "cached": len(self._cache),
+                "workers": self._workers}
+
+    # ---------------------------
+    # AUDITION
+    # ---------------------------
+    def audition(self, presets:Dict[str, dict]) -> Dict[str, AuditionClip]:
+        """ returns {name: AuditionClip} for {name: preset dictionary} (cached clips are not rendered again) """
+        packed = {name: presetToPacked(params) for name, params in presets.items()}
+        missing = {}
+        with self._lock:
+            for p in packed.values():
+                key = p.contentHash()
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    self._hits += 1
+                else:
+                    missing[key] = p
+        if missing:
+            jobs = [(p.toBytes(), self._sequence, self._step_len, self._sr, self._numVoices, OVERVIEW_POINTS)
+                    for p in missing.values()]
+            results = self._map(jobs)
+            with self._lock:
+                for key, result in zip(missing, results):
+                    self._cache[key] = result
+                    self._rendered += 1
+        with self._lock:
+            clips = {}
+            for name, p in packed.items():
+                audio, overview = self._cache[p.contentHash()]
+                clips[name] = AuditionClip(name, p.contentHash(), self._sr, audio, overview)
+            while len(self._cache) > self._cacheSize:
+                self._cache.popitem(last=False)
+            return clips
+
+    def auditionStore(self, store:PresetStore, names:Iterable[str]=None) -> Dict[str, AuditionClip]:
+        """ auditions the presets of a bank (default: all of them) """
+        names = store.names() if names is None else list(names)
+        return self.audition({name: store.load(name) for name in names})
+
+    def getClip(self, key:int):
+        """ returns (audio, overview) of a cached clip by preset hash (None if not cached) """
+        with self._lock:
+            return self._cache.get(key)
+
+    # ---------------------------
+    # WORKERS
+    # ---------------------------
+    def _map(self, jobs:List[tuple]) -> list:
+        if self._workers == 1 or len(jobs) == 1:
+            return [_render_clip(job) for job in jobs]
+        with self._lock:
+            if self._pool is None:
+                # spawn: the server process has running threads (timers, streams) that fork would copy
+                self._pool = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("spawn"))
+            pool = self._pool
+        chunksize = max(1, len(jobs) // (self._workers * 4))
+        return list(pool.map(_render_clip, jobs, chunksize=chunksize))
+
+    def close(self) -> None:
+        """ stops the worker processes (they are started again by the next audition) """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+if __name__ == "__main__":
+    import time
+    bank = {}
+    for i in range(32):
+        sound = SynthesiserSound(algorithm=i % 8 + 1, ratio_A=1 + i % 4, feedback_C=i / 16)
+        bank[f"patch_{i}"] = PresetManager(sound).params_to_dict()
+    auditioner = BankAuditioner()
+    start = time.perf_counter()
+    clips = auditioner.audition(bank)
+    print(f"{len(clips)} presets rendered in {time.perf_counter() - start:.2f} s ({auditioner.getStats()})")
+    start = time.perf_counter()
+    auditioner.audition(bank)
+    print(f"again (cached) in {time.perf_counter() - start:.3f} s")
+    auditioner.close()
@@ -0,0 +1,78 @@
+from .class_Synthesiser import Synthesiser
+from .class_SynthesiserSound import SynthesiserSound
+from .class_BatchVoice import BatchVoice
+from .class_ParamRegistry import PARAMS
+import numpy as np
+
+MAX_SWEEP_SIZE = 256 # variants rendered in one pass
+
+
+class BatchSynthesiser(Synthesiser):
+    """ Synthesiser rendering batchSize variants of the same sound in a single pass.
+    Its voices (BatchVoice) carry a leading batch axis, so render() returns a (numSamples, batchSize) array.
+    The per-sample loop runs once for the whole batch: each step is a few NumPy operations on
+    batchSize values instead of batchSize separate engine steps.
+
+    *Example usage*
+    -----------------
+    >>> sig = BatchSynthesiser.sweep(synth.sound, "feedback_C", np.linspace(0, 2, 16), ["C4", None], 0.5)
+    >>> sig.shape       # (16, samples)
+    """
+    def __init__(self, numVoices:int, batchSize:int, sample_rate=44100, stealPolicy:str="oldest",
+                 sound:SynthesiserSound=None):
+        self._batchSize = batchSize # read by _create_voice
+        super().__init__(numVoices, sample_rate, stealPolicy, sound)
+        self.setMetricsKind("batch")
+
+    def _create_voice(self) -> BatchVoice:
+        voice = BatchVoice(sound=self.sound, sample_rate=self._sr, batchSize=self._batchSize)
+        try:
+            voice.initialize_modMatrix()
+        except Exception: print("BatchSynthesiser -> unable to initialize modMatrix")
+        self._parkedAt[voice] = self._lfoEpoch
+        return voice
+
+    def _new_buffer(self, numSamples:int) -> np.ndarray:
+        return np.zeros((numSamples, self._batchSize))
+
+    def getBatchSize(self) -> int:
+        return self._batchSize
+
+    @staticmethod
+    def sweepableParams() -> list:
+        """ ids of the parameters that can be swept (the continuous ModMatrix destinations) """
+        return [d.id for d in PARAMS.modDestinations()]
+
+    @classmethod
+    def sweep(cls, sound:SynthesiserSound, paramId:str, values, sequence:list, step_len:float,
+              numVoices:int=6, sample_rate:int=44100, numLoops:int=1) -> np.ndarray:
+        """ renders the sequence once for each value of paramId (the rest of the sound is unchanged).
+        returns a float32 (len(values), samples) array, normalized as a whole (relative levels are kept).
+        raises ValueError if the parameter can't be swept """
+        descriptor = PARAMS.byId(paramId)
+        if descriptor is None or not descriptor.modulatable:
+            raise ValueError(f"BatchSynthesiser: '{paramId}' can't be swept. sweepable: {cls.sweepableParams()}")
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if not 1 <= len(values) <= MAX_SWEEP_SIZE or not np.all(np.isfinite(values)):
+            raise ValueError(f"BatchSynthesiser: a sweep needs 1 to {MAX_SWEEP_SIZE} finite values")
+        values = np.clip(values, descriptor.minimum, descriptor.maximum)
+
+        sweep_sound = sound.copy() # private copy: the swept slot holds an array
+        setattr(sweep_sound, descriptor.slot, values)
+        engine = cls(numVoices, len(values), sample_rate, sound=sweep_sound)
+        sig = engine.sequencer.create_sequence(sequence, step_len, numLoops, dtype=np.float32)
+        return np.ascontiguousarray(sig.T)
+
+
+if __name__ == "__main__":
+    import time
+    sound = SynthesiserSound(algorithm=2)
+    values = np.linspace(0, 2, 16)
+    start = time.perf_counter()
+    sig = BatchSynthesiser.sweep(sound, "feedback_C", values, ["C4", ("E4", "G4")], 0.5)
+    batch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    sound.setFeedbackC(values[-1])
+    single = Synthesiser(6, sound=sound).sequencer.create_sequence(["C4", ("E4", "G4")], 0.5)
+    single_time = time.perf_counter() - start
+    print(f"{sig.shape} in {batch_time:.2f} s (one render: {single_time:.2f} s, x{single_time * len(values) / batch_time:.1f})")
@@ -0,0 +1,115 @@
+from .class_SynthesiserVoice import SynthesiserVoice
+from .class_SynthesiserSound import SynthesiserSound
+from .class_FmFeedbackOsc import FmFeedbackOsc
+from .class_Operator import Operator
+from .class_Adsr import Adsr
+import numpy as np
+
+
+class _BatchFmFeedbackOsc(FmFeedbackOsc):
+    """ FmFeedbackOsc computing batchSize oscillators at once: phase and feedback history are (batchSize,) arrays,
+    frequency and feedback can be floats or (batchSize,) arrays.
+    every sample is computed in place in the buffer of the oldest feedback sample (no allocation), 
+    and the phase is wrapped every WRAP_INTERVAL samples instead of at every sample """
+    WRAP_INTERVAL = 64
+
+    def __init__(self, batchSize:int, sample_rate=44100):
+        super().__init__(sample_rate=sample_rate)
+        self._phase = np.zeros(batchSize)
+        self._old0 = np.zeros(batchSize)
+        self._old1 = np.zeros(batchSize)
+        self._halfFeedback = 0.0
+        self._hasFeedback = False
+        self._count = 0
+
+    def setFeedback(self, fb):
+        self._feedback = fb
+        self._halfFeedback = 0.5 * fb
+        self._hasFeedback = bool(np.any(fb))
+
+    def setPhase(self, phase:float):
+        self._phase = np.full(len(self._old0), phase % self._twoPi)
+
+    def reset(self):
+        self.setPhase(0.0)
+        self._old0 = np.zeros(len(self._phase))
+        self._old1 = np.zeros(len(self._phase))
+
+    def getCurrentSample(self, phase_mod_input=0.0):
+        return np.sin(self._phase + 0.5 * (self._old0 + self._old1) * self._feedback + phase_mod_input)
+
+    def getNextSample(self, phase_mod_input=0.0):
+        sample = self._old1 # recycled: the oldest feedback sample is not needed after this
+        if self._hasFeedback:
+            np.add(self._old0, sample, out=sample)
+            np.multiply(sample, self._halfFeedback, out=sample)
+            np.add(sample, self._phase, out=sample)
+        else:
+            np.copyto(sample, self._phase)
+        if isinstance(phase_mod_input, np.ndarray) or phase_mod_input != 0.0:
+            np.add(sample, phase_mod_input, out=sample)
+        np.sin(sample, out=sample)
+        self._old1 = self._old0
+        self._old0 = sample
+
+        self._phase += self._freqRad
+        self._count += 1
+        if self._count >= self.WRAP_INTERVAL:
+            np.fmod(self._phase, self._twoPi, out=self._phase)
+            self._count = 0
+        return sample
+
+
+class _BatchOperator(Operator):
+    """ Operator with a batched oscillator. setters modulated by the ModMatrix accept arrays """
+    def __init__(self, batchSize:int, sample_rate=44100):
+        super().__init__(sample_rate=sample_rate)
+        self.oscillator = _BatchFmFeedbackOsc(batchSize, sample_rate)
+        self._update_frequency()
+
+    def setFeedback(self, value):
+        self._feedback = np.maximum(value, 0)
+        self.oscillator.setFeedback(self._feedback)
+
+    def setLev(self, value):
+        self.adsr.setAmplitude(np.maximum(value, 0))
+
+
+class _BatchAdsr(Adsr):
+    """ Adsr whose amplitude can be a (batchSize,) array. the level is the loudest of the batch """
+    def getLevel(self):
+        return float(np.max(np.abs(self._value * self._amplitude)))
+
+
+class BatchVoice(SynthesiserVoice):
+    """ SynthesiserVoice rendering batchSize variants of the same note in one pass.
+
+    The oscillator state carries a leading batch axis, so getNextSample() returns a (batchSize,) array.
+    Continuous parameters applied per sample (the ModMatrix destinations: mix, amp, ratios, levels, feedbacks)
+    can be (batchSize,) arrays in the sound: they broadcast through the algorithms unchanged.
+    Envelope times, LFOs and routings are shared by the whole batch (they drive branches, not arithmetic).
+    Used by BatchSynthesiser (parameter sweeps). """
+    def __init__(self, sound:SynthesiserSound, sample_rate:int=44100, batchSize:int=1):
+        super().__init__(sound, sample_rate)
+        self._batchSize = batchSize
+        self.adsr_amp = _BatchAdsr(1, 1, 1, 1, 1, self._sr)
+        self.A = _BatchOperator(batchSize, self._sr)
+        self.B1 = _BatchOperator(batchSize, self._sr)
+        self.B2 = _BatchOperator(batchSize, self._sr)
+        self.C = _BatchOperator(batchSize, self._sr)
+        self.operators = [self.A, self.B1, self.B2, self.C]
+
+    def getBatchSize(self) -> int:
+        return self._batchSize
+
+    def setMix(self, value):
+        value = np.clip(value, 0.0, 1.0)
+        self._mix_X = value
+        self._mix_Y = 1 - value
+
+    def setAmplitude(self, newAmp):
+        self.adsr_amp.setAmplitude(np.clip(newAmp, 0.0, 1.0))
+
+    def getState(self) -> tuple:
+        """ arrays are turned into bytes, so two states can be compared with == """
+        return tuple(v.tobytes() if isinstance(v, np.ndarray) else v for v in super().getState())
@@ -0,0 +1,146 @@
+from .class_Synthesiser import Synthesiser
+from .class_Sequencer import Sequencer
+from .class_PackedSound import PackedSound
+from .class_PresetStore import PresetStore, DEFAULT_PRESET_STORE
+from .class_BankAuditioner import presetToPacked
+from .class_WavWriter import SAMPLE_FORMATS
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+import hashlib
+import json
+import os
+import re
+import time
+
+DEFAULT_JOB = {"step_len": 0.5, "loops": 1, "sample_rate": 44100, "format": "int16"}
+
+
+def loadJobs(path:str) -> List[dict]:
+    """ reads render jobs from a .jsonl file (one job per line), a .json file (a job or a list of jobs)
+    or a directory of such files (alphabetical order). a job:
+        {"name": "bell_arp", "preset": "bell" | "params": {...}, "grid": [["C4"], null, [64, 67]],
+         "step_len": 0.5, "loops": 1, "sample_rate": 44100, "format": "int16"} """
+    if os.path.isdir(path):
+        jobs = []
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith((".json", ".jsonl")):
+                jobs += loadJobs(os.path.join(path, filename))
+        return jobs
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        jobs = json.load(f)
+        return jobs if isinstance(jobs, list) else [jobs]
+
+def _parse_grid(grid:list) -> list:
+    """ JSON grid -> sequencer steps (lists become chords) """
+    return [tuple(step) if isinstance(step, list) else step for step in grid]
+
+def _render_job(task:tuple) -> tuple:
+    """ worker: renders one job into its WAV file. returns (samples, sample_rate, seconds, error) """
+    packed_bytes, grid, step_len, loops, sample_rate, sampleFormat, numVoices, path = task
+    start = time.perf_counter()
+    tmp = path + ".part" # renamed when complete: an interrupted job is never mistaken for a rendered one
+    try:
+        sound = PackedSound.fromBytes(packed_bytes).toSound(sample_rate)
+        engine = Synthesiser(numVoices=numVoices, sample_rate=sample_rate, sound=sound)
+        samples = engine.sequencer.render_to_wav(tmp, grid, step_len, loops, sampleFormat=sampleFormat)
+        os.replace(tmp, path)
+        return samples, sample_rate, time.perf_counter() - start, None
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return 0, sample_rate, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+class BulkRenderer:
+    """ Renders batches of jobs (preset or inline parameters + grid) into WAV files with a pool of processes.
+
+    The output file name ends with a content hash of the job (sound, grid, timing, rate and format):
+    a job whose file already exists is skipped, so an interrupted batch can be run again and only
+    the missing or changed jobs are rendered. Throughput is reported as realtime factor
+    (seconds of audio rendered per second of wall time).
+
+    *Example usage*
+    -----------------
+    >>> renderer = BulkRenderer("./renders", workers=8)
+    >>> summary = renderer.run(loadJobs("./jobs.jsonl"))
+    >>> summary["realtime_factor"]
+    """
+    def __init__(self, outputDir:str, workers:int=None, numVoices:int=6, presetFile:str=DEFAULT_PRESET_STORE):
+        self._outputDir = outputDir
+        self._workers = (os.cpu_count() or 1) if workers is None else max(1, workers)
+        self._numVoices = numVoices
+        self._store = PresetStore(presetFile)
+
+    def prepare(self, job:dict) -> tuple:
+        """ validates a job. returns (output path, worker task). raises KeyError/ValueError """
+        job = {**DEFAULT_JOB, **job}
+        if "params" in job:
+            packed = presetToPacked(job["params"])
+        elif "preset" in job:
+            if job["preset"] not in self._store:
+                raise ValueError(f"preset '{job['preset']}' not found in {self._store.getFileName()}")
+            packed = presetToPacked(self._store.load(job["preset"]))
+        else:
+            raise ValueError("a job needs 'preset' or 'params'")
+        grid = _parse_grid(job["grid"])
+        Sequencer().compile_sequence(grid, 1) # raises ValueError/TypeError on invalid notes
+        step_len, loops = float(job["step_len"]), max(1, int(job["loops"]))
+        sample_rate, sampleFormat = int(job["sample_rate"]), job["format"]
+        if sampleFormat not in SAMPLE_FORMATS:
+            raise ValueError(f"format must be one of {tuple(SAMPLE_FORMATS)}")
+
+        settings = json.dumps([job["grid"], step_len, loops, sample_rate, sampleFormat, self._numVoices])
+        h = hashlib.blake2b(digest_size=8)
+        h.update(packed.contentHash().to_bytes(8, "little"))
+        h.update(settings.encode())
+        name = re.sub(r"[^\w\-]+", "_", str(job.get("name") or job.get("preset") or "render"))
+        path = os.path.join(self._outputDir, f"{name}_{h.hexdigest()}.wav")
+        return path, (packed.toBytes(), grid, step_len, loops, sample_rate, sampleFormat, self._numVoices, path)
+
+    def run(self, jobs:List[dict]) -> dict:
+        """ renders the jobs whose output doesn't exist yet. returns a summary dictionary """
+        os.makedirs(self._outputDir, exist_ok=True)
+        tasks, skipped, invalid = [], 0, 0
+        for i, job in enumerate(jobs):
+            try:
+                path, task = self.prepare(job)
+            except (KeyError, ValueError, TypeError) as e:
+                print(f"[job {i}] invalid: {e}")
+                invalid += 1
+                continue
+            if os.path.exists(path) or any(t[-1] == path for t in tasks):
+                skipped += 1
+                continue
+            tasks.append(task)
+
+        print(f"{len(tasks)} jobs to render, {skipped} already rendered, {invalid} invalid ({self._workers} workers)")
+        start = time.perf_counter()
+        audio_seconds = 0.0
+        rendered = failed = 0
+        if tasks:
+            if self._workers == 1:
+                results = ((task, _render_job(task)) for task in tasks)
+            else:
+                pool = ProcessPoolExecutor(min(self._workers, len(tasks)))
+                futures = {pool.submit(_render_job, task): task for task in tasks}
+                results = ((futures[future], future.result()) for future in as_completed(futures))
+            for task, (samples, sample_rate, seconds, error) in results:
+                name = os.path.basename(task[-1])
+                if error is not None:
+                    print(f"  FAILED {name}: {error}")
+                    failed += 1
+                    continue
+                rendered += 1
+                audio_seconds += samples / sample_rate
+                print(f"  {name}: {samples / sample_rate:.2f} s of audio in {seconds:.2f} s "
+                      f"({samples / sample_rate / max(seconds, 1e-9):.2f}x realtime)")
+            if self._workers != 1:
+                pool.shutdown()
+        wall = time.perf_counter() - start
+        summary = {"rendered": rendered, "skipped": skipped, "invalid": invalid, "failed": failed,
+                   "audio_seconds": audio_seconds, "wall_seconds": wall,
+                   "realtime_factor": audio_seconds / wall if wall > 0 else 0.0}
+        print(f"{audio_seconds:.1f} s of audio in {wall:.1f} s: {summary['realtime_factor']:.2f}x realtime")
+        return summary
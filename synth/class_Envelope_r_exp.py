@@ -1,3 +1,5 @@
+import numpy as np
+
 class Envelope_r_exp():
     """ Multiplicative release envelope: exponential decay from 1 to 0. """
     
@@ -31,6 +33,10 @@ class Envelope_r_exp():
         self._smpIndex = 0
         self._lastSample = 1.0
 
+    def getState(self) -> tuple:
+        """returns (sample index, last sample)"""
+        return (self._smpIndex, self._lastSample)
+
     def getSample(self):
         if self._smpIndex >= self._release_smp:
             return 0.0
@@ -40,6 +46,16 @@ class Envelope_r_exp():
         self._smpIndex += 1
         return value
 
+    def getBlock(self, numSamples:int) -> np.ndarray:
+        """ returns the next numSamples samples as an array (same values as getSample) """
+        block = np.zeros(numSamples)
+        n = min(numSamples, max(0, self._release_smp - self._smpIndex))
+        if n:
+            block[:n] = self._lastSample * self._alpha ** np.arange(n)
+            self._lastSample *= self._alpha ** n
+            self._smpIndex += n
+        return block
+
 # --- TEST ---
 if __name__=="__main__":
     from matplotlib import pyplot as plt
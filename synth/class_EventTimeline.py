@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+from typing import List
+
+# event kinds. the value also sets the order of events falling on the same sample:
+# note-offs are applied first (a repeated note is released before being triggered again),
+# then parameter changes (so they are picked up by the following note-ons)
+NOTE_OFF = 0
+PARAM_CHANGE = 1
+NOTE_ON = 2
+
+
+@dataclass(order=True)
+class Event:
+    """ A single engine event placed at a sample offset.
+     * NOTE_ON      : midiNote
+     * NOTE_OFF     : midiNote (or a specific voice, when scheduled by Synthesiser.noteOn)
+     * PARAM_CHANGE : param (name of a SynthesiserSound setter) and value """
+    sample: int
+    kind: int
+    order: int = 0 # insertion order, keeps sorting stable
+    midiNote: int = field(default=None, compare=False)
+    param: str = field(default=None, compare=False)
+    value: object = field(default=None, compare=False)
+    voice: object = field(default=None, compare=False)
+    noteId: int = field(default=None, compare=False)
+
+
+class EventTimeline:
+    """ Sorted list of note-on / note-off / parameter change events with sample offsets.
+    The Synthesiser renders contiguous blocks between events and applies each event exactly at its sample.
+
+    *Example usage*
+    -----------------
+    >>> timeline = EventTimeline()
+    >>> timeline.addNote(0, 60, 22050)                # C4 for half a second
+    >>> timeline.addParamChange(11025, "setMix", 0.8)
+    >>> timeline.addNote(22050, 64, 22050)
+    >>> sig = synth.renderTimeline(timeline, 44100)
+    """
+    def __init__(self):
+        self._events:List[Event] = []
+        self._sorted = True
+
+    def _add(self, event:Event) -> None:
+        if event.sample < 0:
+            raise ValueError("EventTimeline: events can't have a negative sample offset")
+        event.order = len(self._events)
+        self._events.append(event)
+        self._sorted = False
+
+    def addNoteOn(self, sample:int, midiNote:int) -> None:
+        self._add(Event(int(sample), NOTE_ON, midiNote=midiNote))
+
+    def addNoteOff(self, sample:int, midiNote:int) -> None:
+        self._add(Event(int(sample), NOTE_OFF, midiNote=midiNote))
+
+    def addNote(self, sample:int, midiNote:int, numSamples:int) -> None:
+        """ adds a note-on and the matching note-off numSamples later """
+        self.addNoteOn(sample, midiNote)
+        self.addNoteOff(sample + numSamples, midiNote)
+
+    def addParamChange(self, sample:int, param:str, value) -> None:
+        """ param is the name of a SynthesiserSound setter (e.g. "setMix").
+        a tuple value is unpacked (e.g. ("setLfoRate", (1, 3.0)))"""
+        self._add(Event(int(sample), PARAM_CHANGE, param=param, value=value))
+
+    def getEvents(self) -> List[Event]:
+        """ returns the events sorted by sample (and kind for events on the same sample) """
+        if not self._sorted:
+            self._events.sort()
+            self._sorted = True
+        return self._events
+
+    def getLength(self) -> int:
+        """ returns the sample offset of the last event """
+        return max((event.sample for event in self._events), default=0)
+
+    def __len__(self):
+        return len(self._events)
@@ -27,6 +27,16 @@ class FmFeedbackOsc:
     def setPhase(self, phase: float):
         self._phase = phase % self._twoPi
 
+    def reset(self):
+        """phase and feedback history back to 0 (the oscillator restarts from silence)"""
+        self.setPhase(0.0)
+        self._old0 = 0.0
+        self._old1 = 0.0
+
+    def getState(self) -> tuple:
+        """returns (phase, feedback history, frequency, feedback)"""
+        return (self._phase, self._old0, self._old1, self._frequency, self._feedback)
+
     def getCurrentSample(self, phase_mod_input=0.0):
         """
         Returns current sample.
@@ -1,4 +1,5 @@
 from math import pi, sin
+import numpy as np
 
 class LFO:
     """Simple LFO class with control over frequency, waveform, smoothing, phase"""
@@ -73,6 +74,50 @@ class LFO:
             raise ValueError("LFO: invalid waveform index")
         self.waveform = waveform
     
+    def advance(self, numSamples:int):
+        """advances the LFO by numSamples without computing them (used by parked voices).
+        the phase jumps analytically, only the last samples are computed to settle the smoothing"""
+        if numSamples <= 0:
+            return
+        settle = min(numSamples, 7 * self._smoothSamples) if self._smoothEnabled else 0
+        self.phase += (numSamples - settle) * self.frequency * self.srInv
+        self.phase -= int(self.phase)
+        for _ in range(settle):
+            self.getNextSample()
+
+    def getBlock(self, numSamples:int) -> np.ndarray:
+        """returns the next numSamples samples as an array (same values as getNextSample, computed at once).
+        only the smoothing, which depends on the previous output, is computed sample by sample"""
+        increment = self.frequency * self.srInv
+        phase = self.phase + increment * np.arange(numSamples)
+        phase -= np.floor(phase)
+        self.phase += numSamples * increment
+        self.phase -= int(self.phase)
+        if self.waveform == 0: # Sinusoid
+            block = np.sin(self.twopi * phase)
+        elif self.waveform == 1: #Triangle
+            block = 4.0 * np.abs(phase - 0.5) - 1.0
+        elif self.waveform == 2: #Saw UP
+            block = 2.0 * phase - 1.0
+        elif self.waveform == 3: #Saw down
+            block = -2.0 * phase + 1.0
+        else: #Square
+            block = (phase > 0.5).astype(float) - (phase < 0.5)
+        if self._smoothEnabled and self._smoothSamples > 1:
+            alpha = 1.0 / self._smoothSamples
+            value = self._currentValue
+            for i, target in enumerate(block.tolist()):
+                value += alpha * (target - value)
+                block[i] = value
+            self._currentValue = value
+        elif numSamples:
+            self._currentValue = float(block[-1])
+        return block
+
+    def getState(self) -> tuple:
+        """returns (phase, smoothed value)"""
+        return (self.phase, self._currentValue)
+
     def getNextSample(self):
         sampleValue = 0.0
         if self.waveform == 0: # Sinusoid
@@ -0,0 +1,151 @@
+from typing import Dict, Tuple
+import threading
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # seconds
+RTF_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0) # seconds of audio per second of wall time
+
+
+class _Metric:
+    """ one metric family: a value (or histogram) per set of label values """
+    kind = ""
+
+    def __init__(self, name:str, help:str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values:Dict[Tuple, object] = {}
+
+    @staticmethod
+    def _key(labels:dict) -> Tuple:
+        return tuple(sorted(labels.items()))
+
+    @staticmethod
+    def _labels(key:Tuple, extra:str="") -> str:
+        parts = [f'{name}="{str(value)}"' for name, value in key]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{self._labels(key)} {float(value)!r}")
+        return lines
+
+
+class Counter(_Metric):
+    """ monotonic counter. inc() is a lock and an addition: call it once per block or request, not per sample """
+    kind = "counter"
+
+    def inc(self, amount:float=1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """ value that can go up and down """
+    kind = "gauge"
+
+    def set(self, value:float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    """ cumulative histogram with fixed buckets (+ sum and count) """
+    kind = "histogram"
+
+    def __init__(self, name:str, help:str, buckets:tuple=TIME_BUCKETS):
+        super().__init__(name, help)
+        self._buckets = tuple(sorted(buckets))
+
+    def observe(self, value:float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self._buckets), 0.0, 0] # bucket counts, sum, count
+            for i, bound in enumerate(self._buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, n in zip(self._buckets, counts):
+                    cumulative += n
+                    le = 'le="%r"' % bound
+                    lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {count}")
+                lines.append(f"{self.name}_sum{self._labels(key)} {total!r}")
+                lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """ Process-wide metrics, exported in the Prometheus text format (see routes/metrics_routes.py).
+
+    *Example usage*
+    -----------------
+    >>> REQUESTS = METRICS.counter("fm_requests_total", "Requests served")
+    >>> REQUESTS.inc(route="/audio")
+    >>> METRICS.render()       # text exposition format
+    """
+    def __init__(self):
+        self._metrics:Dict[str, _Metric] = {}
+
+    def _add(self, metric:_Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name:str, help:str) -> Counter:
+        return self._add(Counter(name, help))
+
+    def gauge(self, name:str, help:str) -> Gauge:
+        return self._add(Gauge(name, help))
+
+    def histogram(self, name:str, help:str, buckets:tuple=TIME_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+# ENGINE (updated once per render() call: the per-sample loop is not instrumented)
+SAMPLES_RENDERED = METRICS.counter("fm_samples_rendered_total", "Samples rendered by the engines")
+VOICE_SAMPLES = METRICS.counter("fm_voice_samples_total",
+                                "Samples rendered by each playing voice (divided by fm_samples_rendered_total: average active voices)")
+VOICES_ACTIVE = METRICS.gauge("fm_voices_active", "Voices playing at the end of the last block rendered by an engine, by engine kind")
+NOTES = METRICS.counter("fm_notes_total", "Notes received by the voice allocators, by outcome (free voice, stolen voice, dropped)")
+# RENDERS (one observation per finished render)
+RENDER_SECONDS = METRICS.histogram("fm_render_seconds", "Wall time of the offline renders")
+RENDER_RTF = METRICS.histogram("fm_render_realtime_factor", "Seconds of audio rendered per second of wall time", RTF_BUCKETS)
+# SERVER
+PARAM_UPDATES = METRICS.counter("fm_param_updates_total", "Parameter updates applied (rate(): updates per second)")
+WAV_BYTES = METRICS.counter("fm_wav_bytes_served_total", "Bytes of WAV audio sent to the clients")
+HTTP_SECONDS = METRICS.histogram("fm_http_request_seconds", "Duration of the HTTP requests, by endpoint")
+
+
+def observeRender(seconds:float, samples:int, sample_rate:int, kind:str) -> None:
+    """ records a finished offline render (kind: audio, stems, disk, sweep, ...) """
+    RENDER_SECONDS.observe(seconds, kind=kind)
+    if seconds > 0 and samples > 0:
+        RENDER_RTF.observe(samples / sample_rate / seconds, kind=kind)
@@ -0,0 +1,188 @@
+from .class_EventTimeline import EventTimeline
+from typing import List, Tuple
+import struct
+
+DEFAULT_TEMPO = 500000 # microseconds per quarter note (120 bpm)
+
+
+class MidiFileError(ValueError):
+    """ raised when a file is not a valid Standard MIDI File """
+
+
+class MidiFile:
+    """ Minimal Standard MIDI File (format 0 and 1) reader.
+
+    Reads note-on/note-off events of every track and the tempo map; other events (controllers,
+    program changes, sysex, meta events other than tempo) are skipped. Velocity is ignored (the engine
+    has none). toTimeline() converts the notes into a sample-accurate EventTimeline, following the
+    tempo changes (or the SMPTE time base).
+
+    *Example usage*
+    -----------------
+    >>> midi = MidiFile("song.mid")
+    >>> timeline = midi.toTimeline(44100)
+    >>> synth.sequencer.timeline_to_wav("song.wav", timeline, midi.getLengthSamples(44100))
+    """
+    def __init__(self, filename:str=None, data:bytes=None):
+        if data is None:
+            with open(filename, "rb") as f:
+                data = f.read()
+        self.format = 0
+        self.numTracks = 0
+        self._division = 480        # ticks per quarter note (or ticks per second for SMPTE files)
+        self._smpte = False
+        self._tempos:List[Tuple[int, int]] = [] # (tick, microseconds per quarter)
+        self._notes:List[Tuple[int, int, int, int, bool]] = [] # (tick, track, channel, note, on)
+        self._endTick = 0
+        self._parse(data)
+
+    # ---------------------------
+    # PARSER
+    # ---------------------------
+    def _parse(self, data:bytes) -> None:
+        chunks = self._chunks(data)
+        if not chunks or chunks[0][0] != b"MThd" or len(chunks[0][1]) < 6:
+            raise MidiFileError("MidiFile: missing MThd header")
+        self.format, self.numTracks, division = struct.unpack(">HHH", chunks[0][1][:6])
+        if self.format not in (0, 1):
+            raise MidiFileError(f"MidiFile: format {self.format} not supported (only 0 and 1)")
+        if division & 0x8000: # SMPTE: -frames per second, ticks per frame
+            fps = 256 - (division >> 8)
+            self._division = (29.97 if fps == 29 else fps) * (division & 0xFF)
+            self._smpte = True
+        else:
+            self._division = division
+        tracks = [body for kind, body in chunks[1:] if kind == b"MTrk"]
+        for index, body in enumerate(tracks):
+            self._parse_track(body, index)
+        self._tempos.sort()
+        self._notes.sort(key=lambda n: n[0]) # stable: events on the same tick keep the file order
+
+    @staticmethod
+    def _chunks(data:bytes) -> list:
+        chunks, pos = [], 0
+        while pos + 8 <= len(data):
+            kind, length = data[pos:pos + 4], struct.unpack(">I", data[pos + 4:pos + 8])[0]
+            chunks.append((kind, data[pos + 8:pos + 8 + length]))
+            pos += 8 + length
+        return chunks
+
+    @staticmethod
+    def _read_vlq(data:bytes, pos:int) -> Tuple[int, int]:
+        """ variable length quantity -> (value, new position) """
+        value = 0
+        for _ in range(4):
+            if pos >= len(data):
+                raise MidiFileError("MidiFile: truncated variable length value")
+            byte = data[pos]
+            pos += 1
+            value = (value << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                return value, pos
+        raise MidiFileError("MidiFile: variable length value too long")
+
+    def _parse_track(self, data:bytes, track:int) -> None:
+        pos, tick, status = 0, 0, None
+        try:
+            while pos < len(data):
+                delta, pos = self._read_vlq(data, pos)
+                tick += delta
+                byte = data[pos]
+                if byte == 0xFF: # meta event
+                    kind = data[pos + 1]
+                    length, pos = self._read_vlq(data, pos + 2)
+                    if kind == 0x51 and length == 3:
+                        self._tempos.append((tick, int.from_bytes(data[pos:pos + 3], "big")))
+                    pos += length
+                    if kind == 0x2F: # end of track
+                        break
+                    continue
+                if byte in (0xF0, 0xF7): # sysex
+                    length, pos = self._read_vlq(data, pos + 1)
+                    pos += length
+                    continue
+                if byte & 0x80:
+                    status = byte
+                    pos += 1
+                elif status is None:
+                    raise MidiFileError("MidiFile: running status without a previous status byte")
+                kind, channel = status & 0xF0, status & 0x0F
+                if kind in (0xC0, 0xD0): # program change, channel pressure: 1 data byte
+                    pos += 1
+                    continue
+                note, velocity = data[pos], data[pos + 1]
+                pos += 2
+                if kind == 0x90 and velocity > 0:
+                    self._notes.append((tick, track, channel, note, True))
+                elif kind == 0x80 or kind == 0x90: # note-on with velocity 0 is a note-off
+                    self._notes.append((tick, track, channel, note, False))
+        except IndexError:
+            raise MidiFileError(f"MidiFile: track {track} is truncated")
+        self._endTick = max(self._endTick, tick)
+
+    # ---------------------------
+    # TIME CONVERSION
+    # ---------------------------
+    def _tick_to_seconds(self):
+        """ returns a function tick -> seconds following the tempo map (ticks must be increasing) """
+        if self._smpte:
+            return lambda tick: tick / self._division
+        tempos = self._tempos if self._tempos and self._tempos[0][0] == 0 else [(0, DEFAULT_TEMPO)] + self._tempos
+        state = {"index": 0, "tick": 0, "seconds": 0.0}
+        def convert(tick):
+            # advance through the tempo changes passed since the last call
+            while state["index"] + 1 < len(tempos) and tempos[state["index"] + 1][0] <= tick:
+                next_tick = tempos[state["index"] + 1][0]
+                state["seconds"] += (next_tick - state["tick"]) * tempos[state["index"]][1] * 1e-6 / self._division
+                state["tick"] = next_tick
+                state["index"] += 1
+            return state["seconds"] + (tick - state["tick"]) * tempos[state["index"]][1] * 1e-6 / self._division
+        return convert
+
+    def getDuration(self) -> float:
+        """ returns the length of the file in seconds (last event of the longest track) """
+        return self._tick_to_seconds()(self._endTick)
+
+    def getLengthSamples(self, sample_rate:int) -> int:
+        return int(round(self.getDuration() * sample_rate))
+
+    def getNoteCount(self) -> int:
+        return sum(1 for note in self._notes if note[4])
+
+    def toTimeline(self, sample_rate:int, channels=None, tracks=None) -> EventTimeline:
+        """ returns the notes as a sample-accurate EventTimeline.
+        channels / tracks: optional collections of MIDI channels (0-15) / track indexes to keep.
+        notes still held at the end of the file are released there.
+        a note-off is never placed before the sample after its note-on (note-offs sort first at a sample,
+        so a zero-length note would otherwise be held forever) """
+        convert = self._tick_to_seconds()
+        timeline = EventTimeline()
+        held = {} # note -> samples of the note-ons without note-off (oldest first, released first)
+        for tick, track, channel, note, on in self._notes:
+            if (channels is not None and channel not in channels) or (tracks is not None and track not in tracks):
+                continue
+            sample = int(round(convert(tick) * sample_rate))
+            if on:
+                timeline.addNoteOn(sample, note)
+                held.setdefault(note, []).append(sample)
+            elif held.get(note):
+                timeline.addNoteOff(max(sample, held[note].pop(0) + 1), note)
+        end = self.getLengthSamples(sample_rate)
+        for note, starts in held.items():
+            for start in starts:
+                timeline.addNoteOff(max(end, start + 1), note)
+        return timeline
+
+
+if __name__ == "__main__":
+    # two tracks: tempo map (120 bpm, then 60 bpm from beat 2) and a C major arpeggio
+    def track(events):
+        body = b"".join(events) + b"\x00\xff\x2f\x00"
+        return b"MTrk" + struct.pack(">I", len(body)) + body
+    header = b"MThd" + struct.pack(">IHHH", 6, 1, 2, 480)
+    tempo = track([b"\x00\xff\x51\x03" + (500000).to_bytes(3, "big"), b"\x87\x40\xff\x51\x03" + (1000000).to_bytes(3, "big")])
+    notes = track([b"\x00\x90\x3c\x64", b"\x83\x60\x80\x3c\x00", b"\x00\x90\x40\x64", b"\x83\x60\x40\x00", b"\x00\x43\x64", b"\x83\x60\x43\x00"])
+    midi = MidiFile(data=header + tempo + notes)
+    timeline = midi.toTimeline(44100)
+    print(midi.getNoteCount(), "notes,", midi.getDuration(), "s")
+    print([(e.sample, e.kind, e.midiNote) for e in timeline.getEvents()])
@@ -1,14 +1,20 @@
 from .class_LFO import LFO
 from .class_Envelope_r_exp import Envelope_r_exp
+from .class_ParamRegistry import PARAMS
 from typing import List
+import numpy as np
 
 
 class ModMatrix:
     """ ModMatrix composed of modulation sources and destinations. 
-    applies modulations dynamically and in real-time to the synthesiserVoice class """
-    def __init__(self, sample_rate = 44100):
-        self._sr = sample_rate
+    applies modulations dynamically and in real-time to the synthesiserVoice class.
 
+    The routings are a dense (sources x destinations) array of amounts, sources being the LFOs then the
+    release envelope. prepare_block() evaluates every routed source for a whole block as one array and 
+    computes the offsets of every destination with a single matrix multiply, so several sources on the 
+    same destination add up: newValue = centerValue + sum(modSource * modAmount).
+    apply_modulations() then only calls one setter per routed destination at every sample """
+    def __init__(self, sample_rate = 44100):
         self._sr = sample_rate
 
         # lists of functions
@@ -17,15 +23,22 @@ class ModMatrix:
         
         #lfos
         self.lfos = []
-        self._apply_lfo = []
-        self._lfoBase = []
-        self._lfoAmount = []
 
         # release envelope
         self.env = Envelope_r_exp(sample_rate=self._sr)
-        self._apply_env = None
-        self._envBase = None
-        self._envAmount = None
+
+        # routing (see _load_routings)
+        self._amounts = None        # (sources, destinations) amounts, 0 where not routed
+        self._sources:List[int] = []    # routed sources (rows of _amounts)
+        self._dests:List[int] = []      # routed destinations (columns of _amounts)
+        self._routing = None        # _amounts restricted to the routed sources and destinations
+        self._apply:list = []       # setter of every routed destination
+        self._base:list = []        # center value of every routed destination
+
+        # current block (see prepare_block)
+        self._offsets:list = []     # for every routed destination, its offset at every sample of the block
+        self._blockPos:int = 0
+        self._blockLen:int = 0
 
         # reference class
         self.sound = None # read from
@@ -42,88 +55,106 @@ class ModMatrix:
         self.voice = voice
         self.sound = sound
 
-        # modulators need a method to call to be able to modulate
+        # modulators need a method to call to be able to modulate (ordered by destination index)
         self._mod_destinations = [
-            self.voice.setMix,                 # 0
-            self.voice.setAmplitude,           # 1
-            self.voice.A.setRatio,             # 2
-            self.voice.A.setLev,               # 3
-            self.voice.A.setFeedback,          # 4
-            self.voice.B1.setRatio,            # 5
-            self.voice.B1.setLev,              # 6
-            self.voice.B1.setFeedback,         # 7
-            self.voice.B2.setRatio,            # 8
-            self.voice.B2.setLev,              # 9
-            self.voice.B2.setFeedback,         # 10
-            self.voice.C.setRatio,             # 11
-            self.voice.C.setFeedback,          # 12
+            getattr(getattr(self.voice, component) if component else self.voice, setter)
+            for component, setter in (d.mod_target for d in PARAMS.modDestinations())
             ]
         # create an lfo for each defined in SyntesiserSound
         self.lfos = [LFO(sample_rate=self._sr) for _ in sound.lfos]
-        self._apply_lfo = [None] * len(self.lfos)
-        self._lfoBase = [None] * len(self.lfos)
-        self._lfoAmount = [None] * len(self.lfos)
-
-    def update_parameters(self):
-        #modulators need to know the "center" value of the modulation
-        self._mod_base_values = [
-            self.sound.getMix(),
-            self.voice.adsr_amp.getAmplitude(),
-            self.voice.A.getRatio(),
-            self.voice.A.getLev(),
-            self.voice.A.getFeedback(),
-            self.voice.B1.getRatio(),
-            self.voice.B1.getLev(),
-            self.voice.B1.getFeedback(),
-            self.voice.B2.getRatio(),
-            self.voice.B2.getLev(),
-            self.voice.B2.getFeedback(),
-            self.voice.C.getRatio(),
-            self.voice.C.getFeedback(),
-        ]
-
-        # update lfos
-        for i, lfo_params in self.sound.lfos.items():
-            idx = i - 1  # LFO1 → index 0
-            dest = lfo_params.dest
+        self._amounts = np.zeros((len(self.lfos) + 1, len(self._mod_destinations)))
+
+    def _load_routings(self, config) -> None:
+        """ rebuilds the amounts array and the routed sources/destinations from a VoiceConfig """
+        self._mod_base_values = config.mod_base_values
+        self._amounts[:] = 0.0
+        routed = np.zeros(self._amounts.shape, dtype=bool)
+        routes = [(dest, amount) for dest, amount, *_ in config.lfos] + [config.env[:2]]
+        for source, (dest, amount) in enumerate(routes):  # LFO1 → row 0, envelope → last row
             if dest is not None:
-                self.lfos[idx].setParams(lfo_params.frequency, lfo_params.waveform, lfo_params.smooth)
-                self._apply_lfo[idx] = self._mod_destinations[dest]
-                self._lfoBase[idx] = self._mod_base_values[dest]
-                self._lfoAmount[idx] = lfo_params.amount
-        
-        # update envelope (only 1)
-        dest = self.sound.envDestination
-        if dest is not None:
-            self._envBase = self._mod_base_values[dest]
-            self._apply_env = self._mod_destinations[dest]
-            self._envAmount = self.sound.getEnvAmount()
-            self.env.setRelease(self.sound.getEnvRelease())
-        
+                self._amounts[source, dest] += amount
+                routed[source, dest] = True
+        self._sources = np.flatnonzero(routed.any(axis=1)).tolist()
+        self._dests = np.flatnonzero(routed.any(axis=0)).tolist()
+        self._routing = self._amounts[np.ix_(self._sources, self._dests)]
+        self._apply = [self._mod_destinations[dest] for dest in self._dests]
+        self._base = [self._mod_base_values[dest] for dest in self._dests]
+
+    def update_parameters(self, config=None, reload:bool=True):
+        """ reads routings, amounts and base values from a compiled VoiceConfig (default: the current one).
+        reload=False skips the modulation sources settings, already applied for this config """
+        if config is None:
+            config = self.sound.getVoiceConfig(self._sr)
+        if reload:
+            for lfo, (dest, amount, frequency, waveform, smooth) in zip(self.lfos, config.lfos):
+                lfo.setParams(frequency, waveform, smooth)
+            self.env.setRelease(config.env[2])
+        self._load_routings(config)
+
+    def apply_parameter_changes(self, config, groups:set):
+        """ updates base values and routings, and reloads only the modulation sources listed in groups """
+        for idx, (dest, amount, frequency, waveform, smooth) in enumerate(config.lfos):
+            if f"lfo{idx + 1}" in groups:
+                self.lfos[idx].setParams(frequency, waveform, smooth)
+        if "env" in groups:
+            self.env.setRelease(config.env[2])
+        self._load_routings(config)
 
     def noteOn(self):
         self.env.trig() # restart the envelope
 
+    def prepare_block(self, numSamples:int):
+        """ evaluates the routed sources for the next numSamples samples and the destination offsets
+        (one matrix multiply). the other LFOs keep running. the block must be consumed entirely 
+        (apply_modulations / advance_lfos) before the routings change """
+        num_lfos = len(self.lfos)
+        if self._sources:
+            signals = np.empty((len(self._sources), numSamples))
+            for row, source in enumerate(self._sources):
+                signals[row] = self.lfos[source].getBlock(numSamples) if source < num_lfos else self.env.getBlock(numSamples)
+            self._offsets = (self._routing.T @ signals).tolist()
+        for idx, lfo in enumerate(self.lfos):
+            if idx not in self._sources:
+                lfo.advance(numSamples)
+        self._blockPos = 0
+        self._blockLen = numSamples
 
     def apply_modulations(self):
         """ Apply modulations according to destinations and parameters 
-        newValue = centerValue + (modSource * modAmount)
+        newValue = centerValue + sum(modSource * modAmount)
         note: parameters come from SynthesiserSound """
-        # LFO
-        for lfo, apply_fn, base, amount in zip(self.lfos, self._apply_lfo, self._lfoBase, self._lfoAmount):
-            if apply_fn is not None:
-                mod_val = base + lfo.getNextSample() * amount
-                apply_fn(mod_val)
-        # ENVELOPE
-        if self._apply_env is not None:
-            mod_val = self._envBase + self.env.getSample() * self._envAmount
-            self._apply_env(mod_val)
-
-    def advance_lfos(self):
-        """ make lfos advance (use this to keep them running in the back) """
-        for lfo in self.lfos:
-            _ = lfo.getNextSample()
+        if self._blockPos >= self._blockLen: # no block prepared: one sample at a time
+            self.prepare_block(1)
+        pos = self._blockPos
+        for apply_fn, base, offsets in zip(self._apply, self._base, self._offsets):
+            apply_fn(base + offsets[pos])
+        self._blockPos = pos + 1
+
+    def advance_lfos(self, numSamples:int=1):
+        """ make lfos advance (use this to keep them running in the back).
+        the samples left in the prepared block are consumed first """
+        left = self._blockLen - self._blockPos
+        if left > 0:
+            used = min(left, numSamples)
+            self._blockPos += used
+            numSamples -= used
+        if numSamples == 1:
+            for lfo in self.lfos:
+                _ = lfo.getNextSample()
+        elif numSamples > 1:
+            for lfo in self.lfos:
+                lfo.advance(numSamples)
+
+    def getState(self, playing:bool=True) -> tuple:
+        """returns the running state of the routed modulation sources (an unrouted LFO can't change the output).
+        playing=False leaves out the envelope, restarted by the next noteOn"""
+        state = ()
+        for source in self._sources:
+            if source < len(self.lfos):
+                state += self.lfos[source].getState()
+        return state + self.env.getState() if playing else state
 
     def resetLfoPhases(self):
+        self._blockPos = self._blockLen = 0
         for lfo in self.lfos:
             lfo.set_phase(0.0)
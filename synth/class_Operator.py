@@ -23,7 +23,7 @@ class Operator:
         # Oscillator init
         self.oscillator = FmFeedbackOsc(freq=frequency * ratio, feedback=feedback, sample_rate=self._sr)
         # Adsr init
-        self.adsr = Adsr(attack, decay, sustain, release, level)
+        self.adsr = Adsr(attack, decay, sustain, release, level, sample_rate=self._sr)
         self._update_frequency()
 
     def _update_frequency(self):
@@ -119,6 +119,17 @@ class Operator:
         self._update_frequency()
         self.oscillator.setFeedback(self._feedback)
 
+    def applyConfig(self, frequency, ratio, feedback, adsr_params:tuple=None):
+        """sets voice frequency, ratio, feedback and (optionally) the Adsr from a compiled VoiceConfig.
+        adsr_params: (a, d, s, r, level) with times already in samples"""
+        self._voice_freq = frequency
+        self._ratio = ratio
+        self._feedback = feedback
+        if adsr_params is not None:
+            self.adsr.setParams(*adsr_params, in_samples=True)
+        self._update_frequency()
+        self.oscillator.setFeedback(feedback)
+
     def setAdsrParams(self, params:tuple[float]):
         """set level Adsr parameters. expects: (a, d, s, r, level). each one of them can be None"""
         attack, decay, sustain, release, lev = params
@@ -130,18 +141,26 @@ class Operator:
         self.adsr.setParams(attack, decay, sustain, release, lev)
 
     # linkers to subclasses
-    def setGate(self, gate: bool, numSamples: int = None):
-        """ set the Adsr gate. (optional: for a given number of samples) """
-        self.adsr.setGate(gate, numSamples)
+    def setGate(self, gate: bool):
+        """ set the Adsr gate """
+        self.adsr.setGate(gate)
     
     def resetPhase(self):
         """resets operator phase to 0"""
         self.oscillator.setPhase(0.0)
 
+    def restart(self):
+        """resets phase and feedback history of the oscillator (note started from silence)"""
+        self.oscillator.reset()
+
+    def getState(self) -> tuple:
+        """returns the running state of oscillator and Adsr"""
+        return (self._voice_freq, self._ratio) + self.oscillator.getState() + self.adsr.getState()
+
     # dsp methods
-    def noteOn(self, frequency, gate=True, numSamples=None):
+    def noteOn(self, frequency, gate=True):
       """updates frequency and start level ADSR (Fm amount)"""
-      self.adsr.setGate(gate, numSamples)
+      self.adsr.setGate(gate)
       self.freq = frequency
 
     def noteOff(self):
@@ -227,7 +246,7 @@ if __name__ == "__main__":
         sr = 44100
         ops = [A, B1, B2, C]
         for op in ops:
-            op.setGate(True, sr*1)
+            op.setGate(True)
         #Sound settings
         mix = 0.5
         A.attack=300
@@ -0,0 +1,135 @@
+from .class_ParamRegistry import PARAMS, LFO_FIELDS, INT_PARAMS, NUM_LFOS
+import hashlib
+import numpy as np
+
+LAYOUT_VERSION = 1 # part of the hash: bump it when the layout changes
+
+
+def _build_layout():
+    """ returns (float fields, int fields). a field is a SynthesiserSound slot or (lfoIndex, LfoParams field) """
+    floats, ints = [], []
+    for d in PARAMS:
+        (ints if d.id in INT_PARAMS else floats).append(d.slot)
+    for i in range(1, NUM_LFOS + 1):
+        for name, d in LFO_FIELDS.items():
+            (ints if name in INT_PARAMS else floats).append((i, d.slot))
+    return tuple(floats), tuple(ints)
+
+FLOAT_FIELDS, INT_FIELDS = _build_layout()
+_LFO_SLOTS = tuple(d.slot for d in LFO_FIELDS.values()) # LfoParams constructor order
+
+
+class PackedSound:
+    """ Compact, immutable snapshot of a SynthesiserSound:
+     * a read-only float64 array with one entry per float parameter (FLOAT_FIELDS order)
+     * a tuple of integer (or None) parameters: algorithm, destinations, waveforms (INT_FIELDS order)
+
+    copy() is O(1) (the buffer is shared), contentHash() is a stable 64-bit hash of the values
+    (equal sounds have equal hashes across processes and sessions), and toBytes()/fromBytes()
+    move it to another process without re-packing (fromBytes doesn't copy the float buffer).
+
+    *Example usage*
+    -----------------
+    >>> packed = synth.sound.pack()
+    >>> key = packed.contentHash()             # e.g. render cache key
+    >>> sound = packed.toSound()               # independent SynthesiserSound
+    """
+    __slots__ = ("_values", "_ints", "_hash")
+
+    def __init__(self, values:np.ndarray, ints:tuple):
+        if len(values) != len(FLOAT_FIELDS) or len(ints) != len(INT_FIELDS):
+            raise ValueError("PackedSound: values don't match the layout")
+        values = np.asarray(values, dtype=np.float64)
+        if values.flags.writeable:
+            values = values.copy()
+            values.flags.writeable = False
+        self._values = values
+        self._ints = tuple(ints)
+        self._hash = None
+
+    @classmethod
+    def fromSound(cls, sound) -> "PackedSound":
+        def read(field):
+            if isinstance(field, str):
+                return getattr(sound, field)
+            index, slot = field
+            return getattr(sound.lfos[index], slot)
+        values = np.fromiter((read(f) for f in FLOAT_FIELDS), dtype=np.float64, count=len(FLOAT_FIELDS))
+        values.flags.writeable = False
+        packed = cls.__new__(cls)
+        packed._values = values
+        packed._ints = tuple(None if read(f) is None else int(read(f)) for f in INT_FIELDS)
+        packed._hash = None
+        return packed
+
+    def applyTo(self, sound) -> None:
+        """ writes every parameter into sound (its version is bumped) """
+        lfos = {i: {} for i in range(1, NUM_LFOS + 1)}
+        for fields, values in ((FLOAT_FIELDS, self._values.tolist()), (INT_FIELDS, self._ints)):
+            for field, value in zip(fields, values):
+                if isinstance(field, str):
+                    setattr(sound, field, value)
+                else:
+                    lfos[field[0]][field[1]] = value
+        for index, params in lfos.items():
+            sound.setLfoParams(index, *(params[slot] for slot in _LFO_SLOTS))
+
+    def toSound(self, sample_rate:int=44100):
+        """ returns a new SynthesiserSound with these parameters """
+        from .class_SynthesiserSound import SynthesiserSound
+        sound = SynthesiserSound(sample_rate=sample_rate)
+        self.applyTo(sound)
+        return sound
+
+    def copy(self) -> "PackedSound":
+        """ O(1): the (read-only) buffer is shared """
+        packed = PackedSound.__new__(PackedSound)
+        packed._values, packed._ints, packed._hash = self._values, self._ints, self._hash
+        return packed
+
+    def get(self, field):
+        """ returns a value by slot name (e.g. "_ratio_A") or (lfoIndex, field) (e.g. (1, "frequency")) """
+        if field in INT_FIELDS:
+            return self._ints[INT_FIELDS.index(field)]
+        return float(self._values[FLOAT_FIELDS.index(field)])
+
+    def contentHash(self) -> int:
+        """ stable 64-bit hash of the layout and the values (computed once) """
+        if self._hash is None:
+            h = hashlib.blake2b(digest_size=8)
+            h.update(LAYOUT_VERSION.to_bytes(2, "little"))
+            h.update(self._values.astype("<f8", copy=False).tobytes())
+            h.update(repr(self._ints).encode())
+            self._hash = int.from_bytes(h.digest(), "little")
+        return self._hash
+
+    def __hash__(self):
+        return self.contentHash()
+
+    def __eq__(self, other):
+        return (isinstance(other, PackedSound) and self._ints == other._ints
+                and np.array_equal(self._values, other._values))
+
+    # ---------------------------
+    # TRANSFER
+    # ---------------------------
+    def toBytes(self) -> bytes:
+        """ layout version, ints (-1 for None) and float values as little-endian bytes """
+        header = np.array([LAYOUT_VERSION] + [-1 if v is None else v for v in self._ints], dtype="<i8")
+        return header.tobytes() + self._values.astype("<f8", copy=False).tobytes()
+
+    @classmethod
+    def fromBytes(cls, buffer) -> "PackedSound":
+        """ inverse of toBytes. the float values are a view of buffer (no copy) """
+        header = np.frombuffer(buffer, dtype="<i8", count=1 + len(INT_FIELDS))
+        if header[0] != LAYOUT_VERSION:
+            raise ValueError(f"PackedSound: layout version {header[0]} not supported")
+        values = np.frombuffer(buffer, dtype="<f8", offset=header.nbytes, count=len(FLOAT_FIELDS))
+        packed = cls.__new__(cls)
+        packed._values = values # frombuffer of bytes is already read-only
+        packed._ints = tuple(None if v == -1 else int(v) for v in header[1:])
+        packed._hash = None
+        return packed
+
+    def __reduce__(self):
+        return (PackedSound.fromBytes, (self.toBytes(),))
@@ -0,0 +1,234 @@
+from dataclasses import dataclass, asdict
+import math
+from typing import Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class ParamDescriptor:
+    """ Static description of a SynthesiserSound parameter.
+     * id        : name used by the frontend and the API (html id)
+     * key       : name used by presets (getter/setter suffix, e.g. "RatioA" -> getRatioA/setRatioA)
+     * slot      : attribute of SynthesiserSound storing the value
+     * minimum, maximum, unit : range of the control
+     * clamp     : if True, integers are clamped to the range, else an integer (index) out of range is rejected.
+                   float values are always clamped
+     * group     : parameter group propagated to the sounding voices (None: not read by the voices)
+     * mod_index : destination index in the ModMatrix (None: not modulatable)
+     * mod_name  : destination name accepted by setLfoParams (e.g. "a ratio")
+     * mod_target: (voice component, setter) modulated by the ModMatrix. component "" is the voice itself
+     * ui        : False if the parameter has no control in the frontend """
+    id: str
+    key: str
+    slot: str
+    minimum: float
+    maximum: float
+    unit: str = ""
+    clamp: bool = False
+    group: str = None
+    mod_index: int = None
+    mod_name: str = None
+    mod_target: Tuple[str, str] = None
+    ui: bool = True
+
+    @property
+    def setter(self) -> str:
+        return "set" + self.key
+
+    @property
+    def getter(self) -> str:
+        return "get" + self.key
+
+    @property
+    def modulatable(self) -> bool:
+        return self.mod_index is not None
+
+    def toDict(self) -> dict:
+        result = asdict(self)
+        result["modulatable"] = self.modulatable
+        return result
+
+
+def _operator_params(op:str, mod_start:int=None, with_adsr:bool=True) -> List[ParamDescriptor]:
+    """ descriptors of operator 'op'. mod_start: ModMatrix index of its ratio (then level, feedback) """
+    def mod(offset):
+        return None if mod_start is None else mod_start + offset
+    name = op.lower()
+    params = [
+        ParamDescriptor(f"ratio_{op}", f"Ratio{op}", f"_ratio_{op}", 0.125, 16.0, "x", group=op,
+                        mod_index=mod(0), mod_name=f"{name} ratio", mod_target=(op, "setRatio")),
+    ]
+    if with_adsr:
+        params.append(ParamDescriptor(f"level_{op}", f"Lev{op}", f"_lev_{op}", 0.0, 10.0, group=op,
+                                      mod_index=mod(1), mod_name=f"{name} lev", mod_target=(op, "setLev")))
+    params.append(ParamDescriptor(f"feedback_{op}", f"Feedback{op}", f"_feedback_{op}", 0.0, 5.0, group=op,
+                                  mod_index=mod(2 if with_adsr else 1), mod_name=f"{name} fb",
+                                  mod_target=(op, "setFeedback")))
+    if with_adsr:
+        params += [
+            ParamDescriptor(f"attack_{op}", f"Attack{op}", f"_attack_{op}", 1.0, 2000.0, "ms", group=op),
+            ParamDescriptor(f"decay_{op}", f"Decay{op}", f"_decay_{op}", 1.0, 3000.0, "ms", group=op),
+            ParamDescriptor(f"sustain_{op}", f"Sustain{op}", f"_sustain_{op}", 0.0, 1.0, clamp=True, group=op),
+            ParamDescriptor(f"release_{op}", f"Release{op}", f"_release_{op}", 1.0, 2000.0, "ms", group=op),
+        ]
+    return params
+
+
+_DESCRIPTORS = [
+    # general
+    ParamDescriptor("algorithm", "Algorithm", "_algorithm", 1, 8, clamp=True, group="general"),
+    ParamDescriptor("mix", "Mix", "_mix", 0.0, 1.0, clamp=True, group="general",
+                    mod_index=0, mod_name="mix", mod_target=("", "setMix")),
+    ParamDescriptor("master_vol", "MasterVolume", "_masterVolume", 0.0, 1.0, clamp=True),
+    # amp
+    ParamDescriptor("amp", "Amp", "_amp", 0.0, 1.0, clamp=True, group="amp",
+                    mod_index=1, mod_name="amp", mod_target=("", "setAmplitude"), ui=False),
+    ParamDescriptor("attack_amp", "AttackAmp", "_attack_amp", 1.0, 2000.0, "ms", group="amp"),
+    ParamDescriptor("decay_amp", "DecayAmp", "_decay_amp", 1.0, 3000.0, "ms", group="amp"),
+    ParamDescriptor("sustain_amp", "SustainAmp", "_sustain_amp", 0.0, 1.0, clamp=True, group="amp"),
+    ParamDescriptor("release_amp", "ReleaseAmp", "_release_amp", 1.0, 2000.0, "ms", group="amp"),
+    # operators
+    *_operator_params("A", mod_start=2),
+    *_operator_params("B1", mod_start=5),
+    *_operator_params("B2", mod_start=8),
+    *_operator_params("C", mod_start=11, with_adsr=False),
+    # exponential envelope
+    ParamDescriptor("envamt", "EnvAmount", "envAmount", -5.0, 5.0, group="env"),
+    ParamDescriptor("envdest", "EnvDestination", "envDestination", 0, 12, group="env"),
+    ParamDescriptor("envrelease", "EnvRelease", "envRelease", 0.001, 2.0, "s", group="env"),
+]
+
+# LFO fields (one set for each LFO). slot is the LfoParams attribute, setters take (lfoIndex, value)
+LFO_FIELDS = {
+    "dest":   ParamDescriptor("dest", "LfoDestination", "dest", 0, 12),
+    "amount": ParamDescriptor("amount", "LfoAmount", "amount", 0.0, 5.0),
+    "rate":   ParamDescriptor("rate", "LfoRate", "frequency", 0.01, 20.0, "Hz"),
+    "wave":   ParamDescriptor("wave", "LfoWaveform", "waveform", 0, 4, clamp=True),
+    "smooth": ParamDescriptor("smooth", "LfoSmooth", "smooth", 0.0, 1.0, clamp=True),
+}
+# integer (or None) fields
+INT_PARAMS = {"algorithm", "envdest", "dest", "wave"}
+# names used by /api/update-env-param
+ENV_ALIASES = {"dest": "envdest", "amount": "envamt", "release": "envrelease"}
+NUM_LFOS = 3
+
+
+class ParamRegistry:
+    """ Single source of parameter metadata, built once at import time.
+    API routes, PresetManager, SynthesiserSound and ModMatrix resolve parameters through
+    its precomputed lookups instead of building maps at runtime """
+    def __init__(self, descriptors:List[ParamDescriptor]):
+        self._descriptors = tuple(descriptors)
+        self._byId:Dict[str, ParamDescriptor] = {d.id: d for d in descriptors}
+        self._byKey:Dict[str, ParamDescriptor] = {d.key: d for d in descriptors}
+        self._modDestinations = tuple(sorted((d for d in descriptors if d.modulatable), key=lambda d: d.mod_index))
+        assert [d.mod_index for d in self._modDestinations] == list(range(len(self._modDestinations)))
+        self._modNames = {d.mod_name: d.mod_index for d in self._modDestinations}
+        self._groups = {d.slot: d.group for d in descriptors if d.group is not None}
+        # preset keys in alphabetical order (as PresetManager always listed them)
+        self._presetKeys = tuple(sorted(list(self._byKey) + [f"Lfo{i}Params" for i in range(1, NUM_LFOS + 1)]))
+
+    def __iter__(self):
+        return iter(self._descriptors)
+
+    def __len__(self):
+        return len(self._descriptors)
+
+    def byId(self, paramId:str) -> ParamDescriptor:
+        """ returns the descriptor of a frontend/API id (None if unknown) """
+        return self._byId.get(paramId)
+
+    def byKey(self, key:str) -> ParamDescriptor:
+        """ returns the descriptor of a preset key (None if unknown) """
+        return self._byKey.get(key)
+
+    def groupOf(self, slot:str) -> str:
+        """ returns the parameter group of a SynthesiserSound attribute (None if it has no group) """
+        return self._groups.get(slot)
+
+    def modDestinations(self) -> Tuple[ParamDescriptor, ...]:
+        """ modulatable parameters ordered by ModMatrix index """
+        return self._modDestinations
+
+    def modNames(self) -> Dict[str, int]:
+        """ destination name -> ModMatrix index (e.g. "a ratio" -> 2) """
+        return self._modNames
+
+    def presetKeys(self) -> Tuple[str, ...]:
+        """ keys of a preset dictionary """
+        return self._presetKeys
+
+    def convert(self, descriptor:ParamDescriptor, value):
+        """ converts a raw value and brings it into the range of the descriptor. "None" or None stays None.
+        floats are clamped, integers are clamped if descriptor.clamp (else out of range is an error).
+        raises ValueError for a non-finite value (nan, inf) or an integer (index) out of its range """
+        if value is None or value == "None":
+            return None
+        number = float(value)
+        if not math.isfinite(number): # would make the shared sound unrenderable
+            raise ValueError(f"{descriptor.id}: invalid value {value}")
+        if descriptor.id not in INT_PARAMS:
+            return min(max(number, descriptor.minimum), descriptor.maximum)
+        value = int(number)
+        if descriptor.clamp:
+            return min(max(value, descriptor.minimum), descriptor.maximum)
+        if not descriptor.minimum <= value <= descriptor.maximum:
+            raise ValueError(f"{descriptor.id} out of range: {value} "
+                             f"({descriptor.minimum}..{descriptor.maximum})")
+        return value
+
+    def setParam(self, sound, paramId:str, value):
+        """ converts and sets a parameter from its id. returns the value set.
+        raises KeyError if the id is unknown """
+        descriptor = self._byId[paramId]
+        value = self.convert(descriptor, value)
+        getattr(sound, descriptor.setter)(value)
+        return value
+
+    def setLfoParam(self, sound, name:str, lfoIndex:int, value):
+        """ converts and sets an LFO field ('dest', 'wave', 'amount', 'rate', 'smooth').
+        raises KeyError if the name is unknown, ValueError for an invalid index or value """
+        descriptor = LFO_FIELDS[name]
+        if not 1 <= lfoIndex <= NUM_LFOS:
+            raise ValueError(f"LFO index out of range: {lfoIndex}")
+        value = self.convert(descriptor, value)
+        getattr(sound, descriptor.setter)(lfoIndex, value)
+        return value
+
+    def applyUpdates(self, sound, updates:list) -> list:
+        """ applies a batch of updates [{"name", "value"[, "lfoIndex"]}, ...] all or nothing.
+        updates of the same parameter are coalesced (the last value wins).
+        every update is validated before anything is set: raises KeyError (unknown name)
+        or ValueError (invalid value/index). returns the applied [(name, lfoIndex, value)] """
+        coalesced = {}
+        for update in updates:
+            name = update.get("name")
+            lfoIndex = update.get("lfoIndex")
+            if lfoIndex is None:
+                descriptor = self._byId.get(name)
+            else:
+                lfoIndex = int(lfoIndex)
+                if not 1 <= lfoIndex <= NUM_LFOS:
+                    raise ValueError(f"LFO index out of range: {lfoIndex}")
+                descriptor = LFO_FIELDS.get(name)
+            if descriptor is None:
+                raise KeyError(name)
+            coalesced[(name, lfoIndex)] = (descriptor, self.convert(descriptor, update.get("value")))
+
+        for (name, lfoIndex), (descriptor, value) in coalesced.items():
+            setter = getattr(sound, descriptor.setter)
+            if lfoIndex is None:
+                setter(value)
+            else:
+                setter(lfoIndex, value)
+        return [(name, lfoIndex, value) for (name, lfoIndex), (_, value) in coalesced.items()]
+
+    def toDict(self) -> dict:
+        """ serializable description of the registry (served to the frontend) """
+        preset_map = {d.key: d.id for d in self._descriptors if d.ui}
+        preset_map.update({f"Lfo{i}Params": f"lfo{i}" for i in range(1, NUM_LFOS + 1)})
+        return {"params": [d.toDict() for d in self._descriptors],
+                "lfo_fields": [d.toDict() for d in LFO_FIELDS.values()],
+                "preset_map": preset_map}
+
+
+PARAMS = ParamRegistry(_DESCRIPTORS)
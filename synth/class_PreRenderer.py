@@ -0,0 +1,238 @@
+from .class_Synthesiser import Synthesiser, RenderCancelled
+from .class_PackedSound import PackedSound
+from .class_Metrics import observeRender
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import time
+import numpy as np
+
+DEBOUNCE_SECONDS = 0.25 # quiet time after the last parameter change before the pre-render starts
+CACHE_SIZE = 8          # rendered auditions kept in memory
+AUDITION_MODES = ("grid", "note")
+
+
+class _Job:
+    """ background render of one (sound hash, sequence, step_len) key """
+    def __init__(self, key):
+        self.key = key
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.awaited = threading.Event()    # a renderAudio waits for it: it doesn't pause any more
+
+
+class PreRenderer:
+    """ Renders the audition of synth.sound and keeps the results by sound content (PackedSound.contentHash),
+    so going back to earlier settings (e.g. undoing an edit) hits the cache as well.
+
+    After every parameter change (schedule()) a background render of the audition starts once the
+    edits stop for DEBOUNCE_SECONDS, so the next renderAudio() for those settings returns immediately.
+    The audition is the last played grid ("grid" mode, falls back to the note) or a single note ("note" mode).
+     * a newer edit cancels the stale background render
+     * the background render pauses while a foreground render (renderAudio) is running
+     * every render uses a fresh engine on a packed snapshot of the sound, so the same settings always give the same audio
+
+    *Example usage*
+    -----------------
+    >>> prerenderer = PreRenderer(synth)
+    >>> sig = prerenderer.renderAudio(["C4", None], step_len=0.5)   # rendered now, remembered as audition
+    >>> synth.sound.setMix(0.8); prerenderer.schedule()              # rendered in background
+    >>> sig = prerenderer.renderAudio(["C4", None], step_len=0.5)   # cache hit
+    """
+    def __init__(self, synth:Synthesiser, sample_rate=44100, lock=None, debounce:float=DEBOUNCE_SECONDS,
+                 cacheSize:int=CACHE_SIZE):
+        """ lock: held by whoever changes the parameters (a snapshot never sees half a batch) """
+        self.synth = synth
+        self._sr = sample_rate
+        self._lock = lock if lock is not None else threading.Lock()
+        self._debounce = debounce
+        self._cacheSize = cacheSize
+        self._cache = OrderedDict()         # key -> signal (least recently used first)
+        self._stateLock = threading.Lock()  # guards cache, job and timer
+        self._job:_Job = None
+        self._timer:threading.Timer = None
+        self._foreground = 0                # foreground renders running
+        self._idle = threading.Event()      # set when no foreground render is running
+        self._idle.set()
+        # audition
+        self._mode = "grid"
+        self._audition = None               # (sequence, step_len, sample_rate) of the last renderAudio
+        self._auditionNote = (60, 1.0)      # (midi note, seconds)
+        # statistics
+        self._hits = self._misses = self._prerendered = self._cancelled = 0
+
+    # ---------------------------
+    # AUDITION
+    # ---------------------------
+    def setAuditionMode(self, mode:str, note:int=None, seconds:float=None) -> None:
+        """ "grid": last played grid, "note": a single note lasting 'seconds' """
+        if mode not in AUDITION_MODES:
+            raise ValueError(f"PreRenderer: audition mode must be one of {AUDITION_MODES}")
+        self._mode = mode
+        note = self._auditionNote[0] if note is None else int(note)
+        seconds = self._auditionNote[1] if seconds is None else float(seconds)
+        if not 0 <= note <= 127 or seconds <= 0:
+            raise ValueError("PreRenderer: invalid audition note")
+        self._auditionNote = (note, seconds)
+
+    def getAudition(self) -> tuple:
+        """ returns the (sequence, step_len, sample_rate) pre-rendered after a parameter change
+        (the note is rendered at the rate of the last renderAudio) """
+        if self._mode == "grid" and self._audition is not None:
+            return self._audition
+        note, seconds = self._auditionNote
+        sample_rate = self._sr if self._audition is None else self._audition[2]
+        return [note], seconds, sample_rate
+
+    def getStats(self) -> dict:
+        return {"hits": self._hits, "misses": self._misses, "prerendered": self._prerendered,
+                "cancelled": self._cancelled, "cached": len(self._cache)}
+
+    # ---------------------------
+    # RENDERING
+    # ---------------------------
+    def renderAudio(self, sequence:list, step_len:float, sample_rate:int=None, numLoops:int=1) -> np.ndarray:
+        """ returns the audio of the sequence with the current sound (cached, pre-rendered or rendered now)
+        and remembers the sequence as the audition. sample_rate defaults to the full rate """
+        sample_rate = self._sr if sample_rate is None else sample_rate
+        self._audition = (list(sequence), step_len, sample_rate)
+        packed = self._snapshot()
+        key = self._key(packed.contentHash(), sequence, step_len, sample_rate, numLoops)
+        with self._stateLock:
+            job = self._job
+        if job is not None and job.key == key:
+            with self._stateLock:
+                wait = self._idle.is_set() # else the job is paused behind another foreground render
+                if wait:
+                    job.awaited.set()
+                else:
+                    job.cancelled.set()
+            if wait:
+                job.done.wait() # the pre-render of these settings is running: it's faster to wait for it
+        sig = self._get(key)
+        if sig is not None:
+            self._hits += 1
+            return sig
+
+        self._misses += 1
+        with self._foregroundRender():
+            sig = self._render(packed, sequence, step_len, sample_rate, numLoops=numLoops)
+        self._put(key, sig)
+        return sig
+
+    def renderToWav(self, file, sequence:list, step_len:float, sample_rate:int=None, numLoops:int=1,
+                    sampleFormat:str="int16") -> int:
+        """ renders straight into a WAV file (path or binary file object) in bounded memory (long exports, not cached).
+        returns the number of samples """
+        sample_rate = self._sr if sample_rate is None else sample_rate
+        with self._foregroundRender():
+            start = time.perf_counter()
+            sound = self._snapshot().toSound(sample_rate)
+            engine = Synthesiser(numVoices=self.synth.getMaxVoices(), sample_rate=sample_rate, sound=sound)
+            samples = engine.sequencer.render_to_wav(file, sequence, step_len, numLoops, sampleFormat=sampleFormat)
+            observeRender(time.perf_counter() - start, samples, sample_rate, "disk")
+            return samples
+
+    def renderStems(self, sequence:list, step_len:float, taps=("voices", "X", "Y"), sample_rate:int=None,
+                    numLoops:int=1) -> tuple:
+        """ renders the sequence and its stems in one pass (see Sequencer.create_stems, not cached).
+        returns (mix, stems, names) """
+        sample_rate = self._sr if sample_rate is None else sample_rate
+        with self._foregroundRender():
+            start = time.perf_counter()
+            sound = self._snapshot().toSound(sample_rate)
+            engine = Synthesiser(numVoices=self.synth.getMaxVoices(), sample_rate=sample_rate, sound=sound)
+            mix, stems, names = engine.sequencer.create_stems(sequence, step_len, numLoops, taps)
+            observeRender(time.perf_counter() - start, len(mix), sample_rate, "stems")
+            return mix, stems, names
+
+    def schedule(self) -> None:
+        """ called after a parameter change: cancels the stale pre-render and restarts the debounce """
+        with self._stateLock:
+            if self._job is not None:
+                self._job.cancelled.set()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._debounce, self._prerender)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _prerender(self) -> None:
+        """ background render of the audition (runs in the timer thread) """
+        sequence, step_len, sample_rate = self.getAudition()
+        packed = self._snapshot()
+        key = self._key(packed.contentHash(), sequence, step_len, sample_rate, 1)
+        job = _Job(key)
+        with self._stateLock:
+            if key in self._cache or (self._job is not None and not self._job.done.is_set()
+                                      and self._job.key == key and not self._job.cancelled.is_set()):
+                return
+            if self._job is not None:
+                self._job.cancelled.set()
+            self._job = job
+        try:
+            sig = self._render(packed, sequence, step_len, sample_rate, abortCheck=lambda: self._should_abort(job),
+                               kind="prerender")
+            self._put(key, sig)
+            self._prerendered += 1
+        except RenderCancelled:
+            self._cancelled += 1
+        finally:
+            job.done.set()
+
+    def _should_abort(self, job:_Job) -> bool:
+        """ abort check of the background engine: waits while a foreground render is running 
+        (which may have rendered the same key in the meantime), unless a renderAudio is waiting for the job """
+        if not job.awaited.is_set():
+            self._idle.wait()
+        return job.cancelled.is_set() or job.key in self._cache
+
+    @contextmanager
+    def _foregroundRender(self):
+        with self._stateLock:
+            self._foreground += 1
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            with self._stateLock:
+                self._foreground -= 1
+                if self._foreground == 0:
+                    self._idle.set()
+
+    def _render(self, packed:PackedSound, sequence:list, step_len:float, sample_rate:int, abortCheck=None, 
+                numLoops:int=1, kind:str="audio") -> np.ndarray:
+        """ kind: label of the render metrics (the prerender wall time includes its pauses) """
+        start = time.perf_counter()
+        sound = packed.toSound(sample_rate) # private sound: the shared one can change meanwhile
+        engine = Synthesiser(numVoices=self.synth.getMaxVoices(), sample_rate=sample_rate, sound=sound)
+        engine.setAbortCheck(abortCheck)
+        sig = engine.sequencer.create_sequence(sequence, step_len, numLoops, dtype=np.float32)
+        observeRender(time.perf_counter() - start, len(sig), sample_rate, kind)
+        return sig
+
+    def _snapshot(self) -> PackedSound:
+        """ returns a packed snapshot of the sound (cheap: taken on every request) """
+        with self._lock:
+            return self.synth.sound.pack()
+
+    # ---------------------------
+    # CACHE
+    # ---------------------------
+    @staticmethod
+    def _key(soundHash:int, sequence:list, step_len:float, sample_rate:int, numLoops:int) -> tuple:
+        return (soundHash, tuple(sequence), float(step_len), int(sample_rate), int(numLoops))
+
+    def _get(self, key:tuple):
+        with self._stateLock:
+            sig = self._cache.get(key)
+            if sig is not None:
+                self._cache.move_to_end(key)
+            return sig
+
+    def _put(self, key:tuple, sig:np.ndarray) -> None:
+        with self._stateLock:
+            self._cache[key] = sig
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cacheSize:
+                self._cache.popitem(last=False)
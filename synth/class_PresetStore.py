@@ -0,0 +1,221 @@
+import ast
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List
+
+SCHEMA_VERSION = 1
+DEFAULT_PRESET_STORE = "./FmSynth_presets.jsonl"
+LEGACY_PRESET_FILE = "./FmSynth_presets.txt"
+# beginning of a record written by PresetStore (json.dumps keeps the key order)
+_RECORD_HEAD = re.compile(rb'\{"schema": (\d+), "name": ("(?:[^"\\]|\\.)*")(, "deleted": true)?')
+_RECORD_START = b'{"schema": '
+
+
+class PresetStore:
+    """ Preset bank stored as JSON Lines, one record per line:
+        {"schema": 1, "name": "my_patch", "params": {"Algorithm": 2, ...}}
+
+    * an in-memory index (name -> byte offset of its record) is built with a single pass over the file,
+      then a preset is loaded by seeking straight to its line
+    * saving appends a record (a newer record of the same name replaces the older one),
+      deleting appends a tombstone: compact() rewrites the file with the live records only
+    * records are parsed with json, nothing is ever evaluated
+
+    *Example usage*
+    -----------------
+    >>> store = PresetStore("./my_bank.jsonl")
+    >>> store.save("bell", synth.preset.params_to_dict())
+    >>> synth.preset.dict_to_params(store.load("bell"))
+    >>> store.exportPresets("./bells.jsonl", ["bell"])
+    """
+    def __init__(self, filename:str=DEFAULT_PRESET_STORE):
+        self._filename = filename
+        self._index:Dict[str, int] = None   # name -> offset (built on first use)
+        self._lock = threading.Lock()
+
+    def getFileName(self) -> str:
+        return self._filename
+
+    # ---------------------------
+    # INDEX
+    # ---------------------------
+    def _ensure_index(self) -> None:
+        if self._index is not None:
+            return
+        self._index = {}
+        if not os.path.exists(self._filename):
+            return
+        with open(self._filename, "rb") as f:
+            offset = 0
+            for line in f:
+                start = 0
+                record = self._parse_head(line)
+                if record is None and line.rfind(_RECORD_START) > 0:
+                    # a record appended after an interrupted write (before the newline fix): keep the last one
+                    start = line.rfind(_RECORD_START)
+                    record = self._parse_head(line[start:])
+                if record is not None:
+                    if record.get("deleted"):
+                        self._index.pop(record["name"], None)
+                    else:
+                        self._index[record["name"]] = offset + start
+                offset += len(line)
+
+    def _parse_head(self, line:bytes):
+        """ reads only schema, name and tombstone of a complete record written by this class (the params are
+        skipped, so indexing a large bank doesn't parse every preset). other lines are fully parsed,
+        so truncated or merged records are not indexed """
+        match = _RECORD_HEAD.match(line)
+        if match is None or not line.endswith(b"}\n") or line.count(_RECORD_START) != 1:
+            return self._parse(line)
+        schema, name, deleted = match.groups()
+        if int(schema) > SCHEMA_VERSION:
+            return self._parse(line)
+        return {"name": json.loads(name), "deleted": deleted is not None}
+
+    def _parse(self, line:bytes):
+        """ returns the record of a line (None for blank lines, unknown schemas and corrupted lines) """
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            print(f"PresetStore: skipping a corrupted line in {self._filename}")
+            return None
+        if not isinstance(record, dict) or "name" not in record:
+            return None
+        if record.get("schema", SCHEMA_VERSION) > SCHEMA_VERSION:
+            print(f"PresetStore: preset '{record['name']}' needs a newer schema ({record['schema']})")
+            return None
+        return record
+
+    def names(self) -> List[str]:
+        """ returns the preset names (in saving order) """
+        with self._lock:
+            self._ensure_index()
+            return list(self._index)
+
+    def __contains__(self, name:str) -> bool:
+        with self._lock:
+            self._ensure_index()
+            return name in self._index
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_index()
+            return len(self._index)
+
+    # ---------------------------
+    # LOAD / SAVE
+    # ---------------------------
+    def load(self, name:str) -> dict:
+        """ returns the parameters of a preset. raises KeyError if it doesn't exist or can't be read """
+        with self._lock:
+            self._ensure_index()
+            offset = self._index[name]
+            with open(self._filename, "rb") as f:
+                f.seek(offset)
+                record = self._parse(f.readline())
+            if record is None or record.get("name") != name or "params" not in record:
+                raise KeyError(name)
+            return record["params"]
+
+    def save(self, name:str, params:dict, overwrite:bool=False) -> bool:
+        """ saves a preset. returns False (nothing written) if the name exists and overwrite is False """
+        if not name:
+            raise ValueError("PresetStore: a preset needs a name")
+        with self._lock:
+            self._ensure_index()
+            if name in self._index and not overwrite:
+                return False
+            self._append([{"schema": SCHEMA_VERSION, "name": name, "params": params}])
+            return True
+
+    def delete(self, name:str) -> bool:
+        """ removes a preset (returns False if it doesn't exist) """
+        with self._lock:
+            self._ensure_index()
+            if name not in self._index:
+                return False
+            self._append([{"schema": SCHEMA_VERSION, "name": name, "deleted": True}])
+            return True
+
+    def _append(self, records:List[dict]) -> None:
+        """ appends records with a single write and updates the index """
+        with open(self._filename, "a+b") as f:
+            offset = f.seek(0, os.SEEK_END)
+            if offset:
+                f.seek(offset - 1)
+                if f.read(1) != b"\n": # last write interrupted: the truncated line stays on its own
+                    f.write(b"\n")
+                    offset += 1
+            for record in records:
+                line = (json.dumps(record) + "\n").encode("utf-8")
+                f.write(line)
+                if record.get("deleted"):
+                    self._index.pop(record["name"], None)
+                else:
+                    self._index[record["name"]] = offset
+                offset += len(line)
+
+    def compact(self) -> None:
+        """ rewrites the file keeping only the live records """
+        with self._lock:
+            self._ensure_index()
+            records = []
+            if self._index:
+                with open(self._filename, "rb") as f:
+                    for offset in self._index.values():
+                        f.seek(offset)
+                        records.append(f.readline().strip() + b"\n")
+            tmp = self._filename + ".tmp"
+            with open(tmp, "wb") as f:
+                f.writelines(records)
+            os.replace(tmp, self._filename)
+            self._index = None
+
+    # ---------------------------
+    # BATCH IMPORT / EXPORT
+    # ---------------------------
+    def importPresets(self, presets, overwrite:bool=False) -> int:
+        """ imports {name: params} or another .jsonl bank (file name). returns the number of presets written """
+        if isinstance(presets, str):
+            presets = {name: params for name, params in PresetStore(presets).items()}
+        with self._lock:
+            self._ensure_index()
+            records = [{"schema": SCHEMA_VERSION, "name": name, "params": params}
+                       for name, params in presets.items() if overwrite or name not in self._index]
+            if records:
+                self._append(records)
+            return len(records)
+
+    def exportPresets(self, filename:str, names:Iterable[str]=None) -> int:
+        """ writes the presets (default: all) to a new .jsonl bank. returns the number of presets written """
+        names = self.names() if names is None else list(names)
+        with open(filename, "w", encoding="utf-8") as f:
+            for name in names:
+                f.write(json.dumps({"schema": SCHEMA_VERSION, "name": name, "params": self.load(name)}) + "\n")
+        return len(names)
+
+    def items(self):
+        """ yields (name, params) of every preset """
+        for name in self.names():
+            yield name, self.load(name)
+
+    def importLegacyFile(self, filename:str=LEGACY_PRESET_FILE, overwrite:bool=False) -> int:
+        """ imports the old "name: {dict}" text file. values are read with ast.literal_eval (no code execution) """
+        presets = {}
+        with open(filename, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or ":" not in line:
+                    continue
+                name, dict_str = line.split(":", 1)
+                try:
+                    presets[name] = ast.literal_eval(dict_str.strip())
+                except (ValueError, SyntaxError):
+                    print(f"PresetStore: unable to read legacy preset '{name}'")
+        return self.importPresets(presets, overwrite)
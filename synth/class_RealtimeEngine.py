@@ -0,0 +1,269 @@
+from .class_EventTimeline import NOTE_ON, NOTE_OFF, PARAM_CHANGE
+import numpy as np
+import queue
+import threading
+import time
+
+REALTIME_BLOCK_SIZE = 256   # samples served at every audio callback (~5.8 ms at 44.1 kHz)
+BUFFER_BLOCKS = 4           # blocks of the ring buffer (latency = BUFFER_BLOCKS * block size)
+TIMING_WINDOW = 4096        # render times kept for the statistics
+
+
+class RingBuffer:
+    """ Single-producer / single-consumer ring buffer of float32 samples, without locks.
+    The producer only moves the write counter and the consumer only the read counter; a counter is moved
+    after the samples are copied, so each side only ever sees complete data (assigning an int is atomic) """
+    def __init__(self, capacity:int):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._capacity = capacity
+        self._written = 0   # samples written since the start (producer)
+        self._read = 0      # samples read since the start (consumer)
+
+    def getCapacity(self) -> int:
+        return self._capacity
+
+    def available(self) -> int:
+        """ samples ready to be read """
+        return self._written - self._read
+
+    def space(self) -> int:
+        """ samples that can be written """
+        return self._capacity - (self._written - self._read)
+
+    def write(self, samples:np.ndarray) -> int:
+        """ copies as many samples as fit. returns the number written """
+        n = min(len(samples), self.space())
+        start = self._written % self._capacity
+        first = min(n, self._capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:n - first] = samples[first:n]
+        self._written += n
+        return n
+
+    def read(self, out:np.ndarray) -> int:
+        """ fills out with as many samples as available. returns the number read """
+        n = min(len(out), self.available())
+        start = self._read % self._capacity
+        first = min(n, self._capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:n] = self._data[:n - first]
+        self._read += n
+        return n
+
+
+class RealtimeEngine:
+    """ Serves fixed-size blocks of a Synthesiser to an audio callback.
+
+    A render thread keeps a RingBuffer of BUFFER_BLOCKS blocks full; the audio callback only copies from it
+    (no lock, no rendering), so the callback never waits for the engine. Notes and parameter changes are put
+    in a queue by any thread and applied by the render thread before the next block.
+    Every block is timed against its deadline (the time the block lasts): a block slower than that is an overrun,
+    and a callback finding fewer samples than asked is an underrun (the missing samples are silence).
+    Blocks are normalized by the running peak, like AudioStream.
+
+    *Example usage*
+    -----------------
+    >>> engine = RealtimeEngine(Synthesiser(6), blockSize=256)
+    >>> engine.start()
+    >>> engine.noteOn(60)
+    >>> FakeAudioDriver(engine).run(2.0)      # headless: or engine.openOutputStream() with sounddevice
+    >>> engine.getStats()["underruns"]
+    >>> engine.stop()
+    """
+    def __init__(self, synth, blockSize:int=REALTIME_BLOCK_SIZE, bufferBlocks:int=BUFFER_BLOCKS):
+        self.synth = synth
+        synth.setMetricsKind("realtime")
+        self._sr = synth.getSampleRate()
+        self._blockSize = blockSize
+        self._ring = RingBuffer(blockSize * max(2, bufferBlocks))
+        self._events = queue.SimpleQueue()
+        self._thread = None
+        self._running = False
+        self._peak = 0.0
+        # statistics
+        self._blocks = 0
+        self._overruns = 0
+        self._underruns = 0
+        self._missing = 0           # samples replaced by silence
+        self._badEvents = 0         # queued events that raised (skipped)
+        self._error = None          # exception that stopped the render thread
+        self._callbacks = 0
+        self._renderTimes = np.zeros(TIMING_WINDOW)
+
+    def getSampleRate(self) -> int:
+        return self._sr
+
+    def getBlockSize(self) -> int:
+        return self._blockSize
+
+    def getLatency(self) -> float:
+        """ seconds of audio buffered ahead of the callback when the ring is full """
+        return self._ring.getCapacity() / self._sr
+
+    # ---------------------------
+    # EVENTS (any thread)
+    # ---------------------------
+    def noteOn(self, midiNote:int) -> None:
+        self._events.put((NOTE_ON, midiNote))
+
+    def noteOff(self, midiNote:int) -> None:
+        self._events.put((NOTE_OFF, midiNote))
+
+    def setParam(self, setterName:str, value) -> None:
+        """ calls sound.<setterName>(value) before the next block (a tuple value is unpacked) """
+        self._events.put((PARAM_CHANGE, (setterName, value)))
+
+    def _apply_events(self) -> None:
+        while True:
+            try:
+                kind, data = self._events.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if kind == NOTE_ON:
+                    self.synth.noteOn(data)
+                elif kind == NOTE_OFF:
+                    self.synth.noteOff(data)
+                else:
+                    name, value = data
+                    setter = getattr(self.synth.sound, name, None)
+                    if setter is None:
+                        raise AttributeError(f"unknown setter '{name}'")
+                    if isinstance(value, (tuple, list)):
+                        setter(*value)
+                    else:
+                        setter(value)
+            except Exception as e: # a bad event is skipped: the render thread keeps running
+                self._badEvents += 1
+                print(f"RealtimeEngine: event {(kind, data)} ignored ({type(e).__name__}: {e})")
+
+    # ---------------------------
+    # RENDER THREAD
+    # ---------------------------
+    def start(self, prefill:bool=True) -> None:
+        """ starts the render thread. prefill: waits until the ring buffer is full (no underrun at the start) """
+        if self._running:
+            return
+        self._running = True
+        self._error = None
+        self._thread = threading.Thread(target=self._render_loop, name="RealtimeEngine", daemon=True)
+        self._thread.start()
+        while prefill and self._ring.space() >= self._blockSize and self._thread.is_alive():
+            time.sleep(0.001)
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def isRunning(self) -> bool:
+        return self._running
+
+    def _render_loop(self) -> None:
+        try:
+            self._render_blocks()
+        except Exception as e:
+            self._error = f"{type(e).__name__}: {e}"
+            print(f"RealtimeEngine: render thread stopped ({self._error})")
+        finally:
+            self._running = False
+
+    def _render_blocks(self) -> None:
+        block_time = self._blockSize / self._sr
+        while self._running:
+            if self._ring.space() < self._blockSize:
+                time.sleep(block_time / 4) # the callback frees a block every block_time
+                continue
+            start = time.perf_counter()
+            self._apply_events()
+            block = np.asarray(self.synth.render(self._blockSize), dtype=np.float32)
+            self._peak = max(self._peak, float(np.max(np.abs(block))))
+            if self._peak > 0:
+                block *= self.synth.sound.getMasterVolume() / self._peak
+            self._ring.write(block)
+            elapsed = time.perf_counter() - start
+            self._renderTimes[self._blocks % TIMING_WINDOW] = elapsed
+            self._blocks += 1
+            if elapsed > block_time:
+                self._overruns += 1
+
+    # ---------------------------
+    # AUDIO CALLBACK (audio thread)
+    # ---------------------------
+    def callback(self, out:np.ndarray) -> None:
+        """ fills out (1D float32) from the ring buffer. samples not rendered in time are silence """
+        n = self._ring.read(out)
+        self._callbacks += 1
+        if n < len(out):
+            out[n:] = 0.0
+            self._underruns += 1
+            self._missing += len(out) - n
+
+    def sounddeviceCallback(self, outdata, frames, time_info, status) -> None:
+        """ callback for sounddevice.OutputStream (mono, float32) """
+        self.callback(outdata[:, 0])
+
+    def openOutputStream(self):
+        """ returns a started sounddevice.OutputStream fed by this engine (requires sounddevice) """
+        from sounddevice import OutputStream
+        stream = OutputStream(samplerate=self._sr, blocksize=self._blockSize, channels=1, dtype="float32",
+                              callback=self.sounddeviceCallback)
+        stream.start()
+        return stream
+
+    def getStats(self) -> dict:
+        """ render time of the last TIMING_WINDOW blocks against the deadline, underruns and overruns """
+        times = self._renderTimes[:min(self._blocks, TIMING_WINDOW)] * 1000
+        deadline = self._blockSize / self._sr * 1000
+        return {"blocks": self._blocks, "callbacks": self._callbacks, "underruns": self._underruns,
+                "missing_samples": self._missing, "overruns": self._overruns,
+                "bad_events": self._badEvents, "error": self._error,
+                "deadline_ms": deadline,
+                "render_ms_mean": float(times.mean()) if times.size else 0.0,
+                "render_ms_p99": float(np.percentile(times, 99)) if times.size else 0.0,
+                "render_ms_max": float(times.max()) if times.size else 0.0,
+                "load": float(times.mean() / deadline) if times.size else 0.0,
+                "buffered": self._ring.available()}
+
+
+class FakeAudioDriver:
+    """ Calls RealtimeEngine.callback at the pace of a sound card, without audio hardware (headless tests).
+    Blocks are requested on an absolute clock, so a late callback doesn't shift the following ones.
+    The received audio is kept (getAudio) """
+    def __init__(self, engine:RealtimeEngine, blockSize:int=None):
+        self.engine = engine
+        self._blockSize = engine.getBlockSize() if blockSize is None else blockSize
+        self._blocks = []
+
+    def run(self, seconds:float) -> dict:
+        """ runs the callbacks for the given seconds. returns the engine stats """
+        period = self._blockSize / self.engine.getSampleRate()
+        numBlocks = int(seconds / period)
+        start = time.perf_counter()
+        for i in range(numBlocks):
+            delay = start + i * period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            out = np.empty(self._blockSize, dtype=np.float32)
+            self.engine.callback(out)
+            self._blocks.append(out)
+        return self.engine.getStats()
+
+    def getAudio(self) -> np.ndarray:
+        return np.concatenate(self._blocks) if self._blocks else np.zeros(0, dtype=np.float32)
+
+
+if __name__ == "__main__":
+    from .class_Synthesiser import Synthesiser
+    # which block sizes / polyphonies hold up live on this machine
+    for blockSize in (128, 512, 2048):
+        for polyphony in (1, 3, 6):
+            engine = RealtimeEngine(Synthesiser(numVoices=polyphony), blockSize)
+            for note in range(polyphony):
+                engine.noteOn(48 + 4 * note)
+            engine.start()
+            stats = FakeAudioDriver(engine).run(1.0)
+            engine.stop()
+            print(f"block {blockSize:5d}, {polyphony} voices: load {stats['load']:.2f}, "
+                  f"underruns {stats['underruns']}/{stats['callbacks']}, overruns {stats['overruns']}")
@@ -0,0 +1,136 @@
+from contextlib import contextmanager
+import math
+import threading
+
+REFERENCE_SAMPLERATE = 44100 # render costs are expressed in seconds of audio at this rate
+MAX_RENDER_SECONDS = 120.0   # cost of a single render (grid x loops + release tail)
+MAX_EXPORT_SECONDS = 1800.0  # cost of a single export rendered to disk (bounded memory, see Sequencer.render_to_wav)
+MAX_STEPS = 512              # steps of a grid
+MAX_SESSION_RENDERS = 2      # renders running at the same time for one session
+MAX_GLOBAL_RENDERS = 2       # renders running at the same time on the server
+MAX_QUEUE = 8                # renders waiting for a free slot (more are rejected)
+QUEUE_TIMEOUT = 30.0         # seconds a render waits for a free slot
+
+
+class RenderRejected(Exception):
+    """ raised when a render is over budget or the server is busy. status: suggested HTTP status """
+    def __init__(self, message:str, status:int):
+        super().__init__(message)
+        self.status = status
+
+
+class RenderBudget:
+    """ Admission control for the offline renders of the server.
+
+    admit() estimates the cost of a render before it starts (grid steps x step samples x loops + release tail,
+    in seconds of audio at REFERENCE_SAMPLERATE, so a preview render costs half) and accepts it, degrades it
+    to the preview rate when that brings it under budget, or rejects it.
+    slot() then limits the renders running at the same time, per session and globally: a render waits
+    in a bounded queue for a free slot, so one long request can't make every other user wait indefinitely.
+
+    *Example usage*
+    -----------------
+    >>> budget = RenderBudget(maxSeconds=60)
+    >>> sample_rate = budget.admit(len(grid), step_len, loops, release, 44100, previewRate=22050)
+    >>> with budget.slot(session_id):
+    ...     sig = prerenderer.renderAudio(grid, step_len, sample_rate, loops)
+    """
+    def __init__(self, maxSeconds:float=MAX_RENDER_SECONDS, maxSteps:int=MAX_STEPS,
+                 maxSessionRenders:int=MAX_SESSION_RENDERS, maxGlobalRenders:int=MAX_GLOBAL_RENDERS,
+                 maxQueue:int=MAX_QUEUE, queueTimeout:float=QUEUE_TIMEOUT, maxExportSeconds:float=MAX_EXPORT_SECONDS):
+        self._maxSeconds = maxSeconds
+        self._maxExportSeconds = maxExportSeconds
+        self._maxSteps = maxSteps
+        self._maxSession = maxSessionRenders
+        self._maxGlobal = maxGlobalRenders
+        self._maxQueue = maxQueue
+        self._timeout = queueTimeout
+        self._cond = threading.Condition()
+        self._running = 0
+        self._queued = 0
+        self._sessions = {}     # session -> renders admitted (running or queued)
+        # statistics
+        self._admitted = self._degraded = self._rejected = 0
+
+    def getLimits(self) -> dict:
+        return {"max_seconds": self._maxSeconds, "max_export_seconds": self._maxExportSeconds,
+                "max_steps": self._maxSteps,
+                "max_session_renders": self._maxSession, "max_global_renders": self._maxGlobal,
+                "max_queue": self._maxQueue, "queue_timeout": self._timeout}
+
+    def getStats(self) -> dict:
+        """ renders running and waiting (queue depth), admitted / degraded / rejected counts """
+        with self._cond:
+            return {"running": self._running, "queued": self._queued, "admitted": self._admitted,
+                    "degraded": self._degraded, "rejected": self._rejected}
+
+    @staticmethod
+    def estimate(numSteps:int, step_len:float, numLoops:int, releaseSeconds:float, sample_rate:int,
+                 batchSize:int=1) -> float:
+        """ cost of a render in seconds of audio at REFERENCE_SAMPLERATE. 
+        batchSize: variants rendered in one pass (sweeps), each one counts as a render (and holds its audio) """
+        samples = int(step_len * sample_rate) * numSteps * numLoops + int(releaseSeconds * sample_rate)
+        return samples * max(1, batchSize) / REFERENCE_SAMPLERATE
+
+    def admit(self, numSteps:int, step_len:float, numLoops:int, releaseSeconds:float, sample_rate:int,
+              previewRate:int=None, toDisk:bool=False, batchSize:int=1) -> int:
+        """ returns the sample rate to render at: sample_rate, or previewRate (if given) when only the preview
+        fits the budget. toDisk: export rendered to a file, checked against maxExportSeconds instead.
+        batchSize: variants of a sweep (see estimate)
+        raises RenderRejected (400 for an invalid step length, 413 when the render doesn't fit) """
+        maxSeconds = self._maxExportSeconds if toDisk else self._maxSeconds
+        try:
+            if not math.isfinite(step_len * sample_rate): # inf, nan, or too long to be counted in samples
+                raise RenderRejected(f"Invalid step length: {step_len}", 400)
+            if step_len <= 0 or numSteps <= 0:
+                raise RenderRejected("The grid must have at least one step of positive length", 400)
+            if numSteps > self._maxSteps:
+                raise RenderRejected(f"Too many steps: {numSteps} (max {self._maxSteps})", 413)
+            if self.estimate(numSteps, step_len, numLoops, releaseSeconds, sample_rate, batchSize) <= maxSeconds:
+                return sample_rate
+            if previewRate is not None and previewRate < sample_rate and \
+                    self.estimate(numSteps, step_len, numLoops, releaseSeconds, previewRate, batchSize) <= maxSeconds:
+                with self._cond:
+                    self._degraded += 1
+                return previewRate
+            seconds = (step_len * numSteps * numLoops + releaseSeconds) * max(1, batchSize)
+            raise RenderRejected(f"Render too long: {seconds:.1f} s of audio (budget {maxSeconds:.0f} s "
+                                 f"at {REFERENCE_SAMPLERATE} Hz)", 413)
+        except RenderRejected:
+            with self._cond:
+                self._rejected += 1
+            raise
+
+    @contextmanager
+    def slot(self, session:str):
+        """ holds a render slot while the block runs. waits in the queue for a global slot (at most queueTimeout).
+        raises RenderRejected: 429 if the session already has its renders running, 503 if the server is busy """
+        with self._cond:
+            if self._sessions.get(session, 0) >= self._maxSession:
+                self._rejected += 1
+                raise RenderRejected("A render of this session is already running", 429)
+            if self._running >= self._maxGlobal and self._queued >= self._maxQueue:
+                self._rejected += 1
+                raise RenderRejected("Server busy: render queue full", 503)
+            self._sessions[session] = self._sessions.get(session, 0) + 1
+            self._queued += 1
+            admitted = self._cond.wait_for(lambda: self._running < self._maxGlobal, self._timeout)
+            self._queued -= 1
+            if not admitted:
+                self._release_session(session)
+                self._rejected += 1
+                raise RenderRejected("Server busy: no render slot freed in time", 503)
+            self._running += 1
+            self._admitted += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._release_session(session)
+                self._cond.notify()
+
+    def _release_session(self, session:str) -> None:
+        count = self._sessions.pop(session, 0) - 1
+        if count > 0:
+            self._sessions[session] = count
@@ -1,4 +1,21 @@
+from dataclasses import dataclass
 import numpy as np
+import os
+import tempfile
+from .class_EventTimeline import EventTimeline
+from .class_WavWriter import WavWriter, CHUNK_SIZE as WAV_CHUNK_SIZE
+
+TAIL_BLOCK_SIZE = 512       # samples rendered between two silence checks in the release tail
+SILENCE_THRESHOLD = 1e-4    # -80 dB below the peak: below this the release tail is considered over
+MAX_TILED_LOOPS = 64        # loops kept in memory while searching a repetition of the engine state
+
+@dataclass(frozen=True)
+class LoopRepeat:
+    """ yielded by iter_sequence(keepLoops=False) in place of tiled loops: 
+    the samples [start, start + length) already yielded are repeated """
+    start: int
+    length: int
+
 
 class Sequencer:
     """ Simple sequencer class that manages the audio rendering of Synthesiser based on a sequence of notes """
@@ -21,7 +38,8 @@ class Sequencer:
         """attaches the synthesiser to this class"""
         self.synth = synth
 
-    def create_sequence(self, sequence: list, step_len: float, numLoops: int = 1, sample_rate=44100) -> np.ndarray[float]:
+    def create_sequence(self, sequence: list, step_len: float, numLoops: int = 1, sample_rate=None, 
+                        dtype=np.float64) -> np.ndarray[float]:
         """
         Simple polyphonic sequencer with fixed step length.
 
@@ -31,7 +49,8 @@ class Sequencer:
             - str       → note name (e.g. 'C4', 'F#3')
             - tuple of int and/or str → multiple notes at once
         
-        Step_len expressed in seconds\n
+        Step_len expressed in seconds (sample_rate defaults to the rate of the synthesiser)\n
+        dtype: np.float32 halves the memory of the output buffers\n
         Example
         ```
         mySequence = [('c4', 'e4'), 'f4', 'a4', None,
@@ -39,22 +58,182 @@ class Sequencer:
         audio_output = synth.sequencer.create_sequence(mySequence, step_len = 0.5)
         ```
         """
-        step_samples = int(step_len * sample_rate)
-        sig : np.ndarray[float] = np.zeros(0)
-
-        for _ in range(numLoops):
-            for step in sequence:
-                notes_to_play = self._parse_step(step)
-                self._trigger_notes(notes_to_play, step_samples)
-                sig = np.concatenate((sig, self.synth.render(step_samples)))
-        sig = np.concatenate((sig, self._render_release_tail(sample_rate)))
+        chunks = list(self.iter_sequence(sequence, step_len, numLoops, sample_rate, dtype))
+        sig = np.concatenate(chunks) if chunks else np.zeros(0, dtype)
 
-        # NORMALIZATION
-        peak = np.max(np.abs(sig))
+        # NORMALIZATION (in place: sig is a new array)
+        peak = np.max(np.abs(sig)) if sig.size else 0
         if peak > 0:
-            sig = sig / peak * self.synth.sound.getMasterVolume()
+            sig *= self.synth.sound.getMasterVolume() / peak
         return sig
 
+    def create_stems(self, sequence: list, step_len: float, numLoops: int = 1, taps=("voices", "X", "Y"),
+                     sample_rate=None, dtype=np.float32) -> tuple:
+        """ Renders the sequence and the requested stems (see Synthesiser.setStemTaps) in a single pass.
+        returns (mix, stems, names): stems is a (len(names), samples) array. mix and stems are scaled by the 
+        same gain (the loudest of them reaches the master volume), so the voice stems sum to the mix """
+        names = self.synth.setStemTaps(list(taps))
+        try:
+            chunks = list(self.iter_sequence(sequence, step_len, numLoops, sample_rate, dtype, len(names)))
+        finally:
+            self.synth.setStemTaps([])
+        mix = np.concatenate([audio for audio, _ in chunks])
+        stems = np.concatenate([stem for _, stem in chunks], axis=1)
+        peak = max(np.max(np.abs(mix)) if mix.size else 0, np.max(np.abs(stems)) if stems.size else 0)
+        if peak > 0:
+            gain = self.synth.sound.getMasterVolume() / peak
+            mix *= gain
+            stems *= gain
+        return mix, stems, names
+
+    def iter_sequence(self, sequence: list, step_len: float, numLoops: int = 1, sample_rate=None, 
+                      dtype=np.float64, numStems: int = 0, keepLoops: bool = True):
+        """ Yields the audio of the sequence (not normalized) loop by loop, then the release tail.
+        Repeated loops found by state matching are yielded again without being rendered; the loops 
+        are kept in memory only while a repetition is searched (at most MAX_TILED_LOOPS).
+        keepLoops=False: no audio is kept, a LoopRepeat is yielded instead of the repeated loops 
+        (for consumers that can copy what they already received, e.g. a file).
+        numStems > 0: yields (audio, stems) pairs, with the stems set in the synth (see create_stems) """
+        if sample_rate is None:
+            sample_rate = self.synth.getSampleRate()
+        step_samples = int(step_len * sample_rate)
+        timeline = self.compile_sequence(sequence, step_samples)
+        loop_len = step_samples * len(sequence)
+        loops : list = []        # audio of every rendered loop (while tiling)
+        loop_states : list = []  # engine state at the start of every loop
+        tiling = numLoops > 1
+        peak = 0.0               # peak of the rendered loops (tiled loops repeat them)
+
+        loop = 0
+        while loop < numLoops:
+            if tiling:
+                state = self.synth.getState()
+                start = self._find_matching_state(loop_states, state)
+                if start is not None:
+                    # the engine went back to a previous state: loops repeat with this period
+                    period = loop - start
+                    repeats, remainder = divmod(numLoops - loop, period)
+                    if keepLoops:
+                        for _ in range(repeats):
+                            yield from loops[start:loop]
+                    else:
+                        for _ in range(repeats):
+                            yield LoopRepeat(start * loop_len, period * loop_len)
+                    loop += repeats * period
+                    tiling = False # the remainder is rendered to bring the engine to its final state
+                    loops, loop_states = [], []
+                    continue
+                if len(loop_states) >= MAX_TILED_LOOPS: # no repetition: stop searching
+                    tiling = False
+                    loops, loop_states = [], []
+                else:
+                    loop_states.append(state)
+            if numStems:
+                stems = np.zeros((numStems, loop_len), dtype)
+                audio = (np.array(self.synth.renderTimeline(timeline, loop_len, stems), dtype=dtype), stems)
+            else:
+                audio = np.array(self.synth.renderTimeline(timeline, loop_len), dtype=dtype)
+            peak = max(peak, self._peak(audio[0] if numStems else audio))
+            if tiling and keepLoops:
+                loops.append(audio)
+            yield audio
+            loop += 1
+        yield self._render_release_tail(sample_rate, dtype, numStems, peak)
+
+    def render_to_wav(self, file, sequence: list, step_len: float, numLoops: int = 1, sample_rate=None, 
+                      sampleFormat: str = "int16") -> int:
+        """ Renders the sequence into a WAV file (path or binary file object) in bounded memory (for very long exports).
+        The float32 audio is appended to a temporary file while its peak is tracked, then read back 
+        through a memmap, normalized and encoded chunk by chunk. Tiled loops are copied inside the 
+        temporary file (no loop is kept in memory). Returns the number of samples """
+        if sample_rate is None:
+            sample_rate = self.synth.getSampleRate()
+        chunks = self.iter_sequence(sequence, step_len, numLoops, sample_rate, np.float32, keepLoops=False)
+        return self._write_wav(file, chunks, sample_rate, sampleFormat)
+
+    def iter_timeline(self, timeline: EventTimeline, numSamples: int, sample_rate=None, dtype=np.float64, 
+                      chunkSize: int = WAV_CHUNK_SIZE):
+        """ Yields the audio of a timeline (not normalized) in chunks of chunkSize samples, then the release tail.
+        Every event is scheduled once, so a long file (e.g. MidiFile.toTimeline) is rendered in a single 
+        pass of the block engine without being held in memory """
+        if sample_rate is None:
+            sample_rate = self.synth.getSampleRate()
+        peak = 0.0
+        for start in range(0, numSamples, chunkSize):
+            length = min(chunkSize, numSamples - start)
+            if start == 0:
+                audio = self.synth.renderTimeline(timeline, length)
+            else:
+                audio = self.synth.render(length)
+            audio = np.array(audio, dtype=dtype)
+            peak = max(peak, self._peak(audio))
+            yield audio
+        if numSamples <= 0: # events at sample 0 are still applied
+            self.synth.renderTimeline(timeline, 0)
+        yield self._render_release_tail(sample_rate, dtype, peak=peak)
+
+    def timeline_to_wav(self, file, timeline: EventTimeline, numSamples: int = None, sample_rate=None, 
+                        sampleFormat: str = "int16") -> int:
+        """ Renders a timeline into a WAV file in bounded memory, like render_to_wav.
+        numSamples defaults to the last event of the timeline. Returns the number of samples """
+        if sample_rate is None:
+            sample_rate = self.synth.getSampleRate()
+        if numSamples is None:
+            numSamples = timeline.getLength()
+        chunks = self.iter_timeline(timeline, numSamples, sample_rate, np.float32)
+        return self._write_wav(file, chunks, sample_rate, sampleFormat)
+
+    def _write_wav(self, file, chunks, sample_rate: int, sampleFormat: str) -> int:
+        """ writes float32 chunks into a WAV file normalized to the master volume (two passes through a temporary file).
+        a LoopRepeat chunk copies samples already written """
+        with tempfile.TemporaryFile() as raw:
+            peak = 0.0
+            length = 0
+            for chunk in chunks:
+                if isinstance(chunk, LoopRepeat):
+                    self._copy_samples(raw, chunk.start, chunk.length)
+                    length += chunk.length
+                elif chunk.size:
+                    peak = max(peak, float(np.max(np.abs(chunk))))
+                    chunk.tofile(raw)
+                    length += len(chunk)
+            raw.flush()
+
+            gain = self.synth.sound.getMasterVolume() / peak if peak > 0 else 1.0
+            f = open(file, "wb") if isinstance(file, (str, os.PathLike)) else file
+            try:
+                writer = WavWriter(f, sample_rate, sampleFormat)
+                if length:
+                    samples = np.memmap(raw, dtype=np.float32, mode="r", shape=(length,))
+                    for start in range(0, length, WAV_CHUNK_SIZE):
+                        writer.write(samples[start:start + WAV_CHUNK_SIZE] * gain)
+                    del samples
+                writer.close()
+            finally:
+                if f is not file:
+                    f.close()
+        return length
+
+    @staticmethod
+    def _copy_samples(raw, start: int, length: int) -> None:
+        """ appends the float32 samples [start, start + length) of raw to its end, WAV_CHUNK_SIZE at a time """
+        itemsize = np.dtype(np.float32).itemsize
+        for offset in range(start, start + length, WAV_CHUNK_SIZE):
+            raw.seek(offset * itemsize)
+            data = raw.read(min(WAV_CHUNK_SIZE, start + length - offset) * itemsize)
+            raw.seek(0, os.SEEK_END)
+            raw.write(data)
+        raw.flush() # the next chunk is written by numpy through the file descriptor
+
+    def compile_sequence(self, sequence: list, step_samples: int) -> EventTimeline:
+        """ Converts one pass of the sequence into a sample-accurate EventTimeline:
+        every note is turned on at the start of its step and turned off at the end of it """
+        timeline = EventTimeline()
+        for i, step in enumerate(sequence):
+            for note in self._parse_step(step):
+                timeline.addNote(i * step_samples, note, step_samples)
+        return timeline
+
     # ---------------------------
     # INTERNAL HELPERS
     # ---------------------------
@@ -84,15 +263,51 @@ class Sequencer:
             return self.note_str_to_midi(note)
         raise TypeError(f"Invalid note type: {type(note)}")
 
-    def _trigger_notes(self, notes: list, step_samples: int):
-        """ Invokes noteOn() for each note in the current step. """
-        for note in notes:
-            self.synth.noteOn(note, step_samples)
+    @staticmethod
+    def _find_matching_state(loop_states: list, state: tuple, tolerance: float = 1e-9):
+        """ Returns the index of the loop that started from the same engine state (None if not found) """
+        for i, other in enumerate(loop_states):
+            if len(other) == len(state) and all(
+                    a == b or (isinstance(a, float) and isinstance(b, float) and abs(a - b) <= tolerance)
+                    for a, b in zip(other, state)):
+                return i
+        return None
+
+    @staticmethod
+    def _peak(audio) -> float:
+        return float(np.max(np.abs(audio))) if audio.size else 0.0
+
+    def _render_release_tail(self, sample_rate, dtype=np.float64, numStems: int = 0, peak: float = 0.0):
+        """ Renders the tail (release) of the sound after the end of last step.
+        The tail lasts as long as the longest-ringing voice, stops early as soon as every voice 
+        is idle (or released below SILENCE_THRESHOLD times the peak rendered so far, so quiet sounds 
+        keep their tail) and is trimmed to its last non-silent sample.
+        peak: peak of the audio before the tail. numStems > 0: returns (tail, stems of the tail) """
+        tail_len = self.synth.getRemainingSamples()
+        if tail_len is None: # held notes: fall back to the amp release time
+            tail_len = int(self.synth.sound.getReleaseAmp() * 0.001 * sample_rate)
+
+        blocks = []
+        stem_blocks = []
+        rendered = 0
+        while rendered < tail_len and not self.synth.isSilent(SILENCE_THRESHOLD * peak):
+            block_len = min(TAIL_BLOCK_SIZE, tail_len - rendered)
+            stems = np.zeros((numStems, block_len), dtype) if numStems else None
+            blocks.append(np.array(self.synth.render(block_len, stems), dtype=dtype))
+            stem_blocks.append(stems)
+            peak = max(peak, self._peak(blocks[-1]))
+            rendered += block_len
+        if not blocks:
+            tail = np.array(self.synth.render(0), dtype=dtype) # empty, shaped like the engine output
+            return (tail, np.zeros((numStems, 0), dtype)) if numStems else tail
 
-    def _render_release_tail(self, sample_rate):
-        """ Renders the tail (release) of the sound after the end of last step."""
-        tail_len = int(self.synth.sound.getReleaseAmp() * 0.001 * sample_rate)
-        return self.synth.render(tail_len)
+        tail = np.concatenate(blocks)
+        level = np.abs(tail) if tail.ndim == 1 else np.abs(tail).max(axis=1) # batched engines: (samples, batch)
+        audible = np.flatnonzero(level > SILENCE_THRESHOLD * peak)
+        end = audible[-1] + 1 if audible.size else 0
+        if numStems:
+            return tail[:end], np.concatenate(stem_blocks, axis=1)[:, :end]
+        return tail[:end]
 
     # ---------------------------
     # NOTE NAME → MIDI CONVERSION
@@ -17,9 +17,20 @@ from .class_SynthesiserSound import SynthesiserSound
 from .class_SynthesiserVoice import SynthesiserVoice
 from .class_PresetManager import PresetManager
 from .class_Sequencer import Sequencer
+from .class_VoiceAllocator import VoiceAllocator
+from .class_EventTimeline import Event, EventTimeline, NOTE_ON, NOTE_OFF, PARAM_CHANGE
+from .class_Metrics import SAMPLES_RENDERED, VOICE_SAMPLES, VOICES_ACTIVE
 from typing import List
+import heapq
 import numpy as np
 
+RENDER_BLOCK_SIZE = 512 # max samples rendered before idle voices are parked
+CHANNEL_TAPS = ("X", "Y") # algorithm outputs (after the amp envelope, before the mix), summed over the voices
+
+
+class RenderCancelled(Exception):
+    """ raised by Synthesiser.render when its abort check returns True """
+
 
 class Synthesiser:
     """
@@ -59,53 +70,318 @@ class Synthesiser:
     >>> play(sig)
     >>> wait()
     """
-    def __init__(self, numVoices:int, sample_rate = 44100):
+    def __init__(self, numVoices:int, sample_rate = 44100, stealPolicy:str = "oldest", sound:SynthesiserSound = None):
+        """ optional: sound shares the parameters of another Synthesiser (e.g. a streaming engine) """
         self._sr = sample_rate
-        self.sound = SynthesiserSound(sample_rate = self._sr)
+        self.sound = SynthesiserSound(sample_rate = self._sr) if sound is None else sound
+        self._soundVersion:int = self.sound.getVersion() # last version applied to the sounding voices
         self.preset = PresetManager(self.sound)
         self.sequencer = Sequencer()
         self.sequencer._initialize_sequencer(self)
-        self._voices:List[SynthesiserVoice] = [SynthesiserVoice(sound=self.sound, sample_rate=self._sr) 
-                                               for _ in range(numVoices)]
+        # voices are created on demand (up to numVoices) and parked when idle
+        self._allocator = VoiceAllocator(self._create_voice, numVoices, stealPolicy)
+        self._voices:List[SynthesiserVoice] = self._allocator.getVoices()
+        self._playing:List[SynthesiserVoice] = []   # voices iterated by the render loop
+        self._parkedAt:dict = {}                    # parked voice -> clock of its LFOs
+        self._lfoEpoch:int = 0                      # clock of the last LFO phase reset
+        # event scheduling
+        self._clock:int = 0                 # samples rendered so far
+        self._pending:List[Event] = []      # heap of events waiting for their sample
+        self._eventCount:int = 0
+        self._abortCheck = None             # called at every block boundary (see setAbortCheck)
+        self._metricsKind:str = "offline"   # label of the fm_voices_active gauge (see setMetricsKind)
+        # stems (see setStemTaps)
+        self._stemTaps:List[str] = []
+        self._stemVoiceRows:dict = {}       # voice index -> stem row
+        self._stemChannelRows:tuple = (None, None) # stem rows of X and Y
+    
+    def _create_voice(self) -> SynthesiserVoice:
+        voice = SynthesiserVoice(sound=self.sound, sample_rate=self._sr)
         try:
-            for voice in self._voices:
-                voice.initialize_modMatrix()
+            voice.initialize_modMatrix()
         except Exception: print("Synthesier -> unable to initialize modMatrix")
-    
+        self._parkedAt[voice] = self._lfoEpoch # LFOs start from the last phase reset
+        return voice
+
+    def _wake(self, voice: SynthesiserVoice) -> None:
+        """moves a parked voice to the render loop, catching up its LFOs"""
+        parked_at = self._parkedAt.pop(voice, None)
+        if parked_at is None: # already playing
+            return
+        voice.advanceLfos(self._clock - parked_at)
+        self._playing.append(voice)
+
+    def _park_idle_voices(self) -> None:
+        """removes the voices that finished their release from the render loop and frees them"""
+        if all(voice.isPlaying() for voice in self._playing):
+            return
+        playing = []
+        for voice in self._playing:
+            if voice.isPlaying():
+                playing.append(voice)
+            else:
+                self._parkedAt[voice] = self._clock
+                self._allocator.free(voice)
+        self._playing = playing
+
+    def _sync_parked_voices(self) -> None:
+        """brings the LFOs of every parked voice to the current clock"""
+        for voice, parked_at in self._parkedAt.items():
+            voice.advanceLfos(self._clock - parked_at)
+            self._parkedAt[voice] = self._clock
+
+    def _apply_parameter_changes(self) -> None:
+        """propagates the parameter groups changed in sound to the sounding voices
+        (parked voices read the whole configuration at their next noteOn)"""
+        version = self.sound.getVersion()
+        if version == self._soundVersion:
+            return
+        groups = self.sound.getDirtyGroups(self._soundVersion)
+        self._soundVersion = version
+        for voice in self._playing:
+            voice.apply_parameter_changes(groups)
+
     def getNextSample(self):
-        """returns the next sample as sum of every voice's next sample"""
-        smp = sum(voice.getNextSample() for voice in self._voices)
+        """returns the next sample as sum of every active voice's next sample"""
+        self._apply_due_events()
+        self._apply_parameter_changes()
+        smp = self._sum_voices()
+        self._clock += 1
+        self._park_idle_voices()
         return smp
 
-    def render(self, numSamples: int) -> List[float]:
-        """renders and returns audio stream for given numSamples"""
-        buffer = [0.0] * numSamples
-        for i in range(numSamples):
-            buffer[i] = self.getNextSample()
+    def _sum_voices(self):
+        return sum(voice.getNextSample() for voice in self._playing)
+
+    def render(self, numSamples: int, stems: np.ndarray = None) -> List[float]:
+        """renders and returns audio stream for given numSamples. 
+        the stream is rendered in contiguous blocks between pending events.
+        stems: optional (numStems, numSamples) array (zeroed) receiving the taps set with setStemTaps, in the same pass"""
+        if stems is not None and stems.shape != (len(self._stemTaps), numSamples):
+            raise ValueError(f"Synthesiser: stems must have shape ({len(self._stemTaps)}, {numSamples})")
+        buffer = self._new_buffer(numSamples)
+        end = self._clock + numSamples
+        pos = 0
+        voice_samples = 0 # metrics: aggregated per block
+        while self._clock < end:
+            if self._abortCheck is not None and self._abortCheck():
+                raise RenderCancelled()
+            self._apply_due_events()
+            self._apply_parameter_changes() # live edits are applied at block boundaries
+            block_end = min(end, self._clock + RENDER_BLOCK_SIZE)
+            if self._pending:
+                block_end = min(block_end, self._pending[0].sample)
+            block_len = block_end - self._clock
+            if self._playing:
+                voice_samples += len(self._playing) * block_len
+                for voice in self._playing:
+                    voice.prepareBlock(block_len)
+                if stems is None:
+                    for i in range(pos, pos + block_len):
+                        buffer[i] = self._sum_voices()
+                else:
+                    self._render_stems(buffer, stems, pos, block_len)
+            pos += block_len
+            self._clock = block_end
+            self._park_idle_voices()
+        SAMPLES_RENDERED.inc(numSamples)
+        VOICE_SAMPLES.inc(voice_samples)
+        VOICES_ACTIVE.set(len(self._playing), engine=self._metricsKind)
         return buffer
-    
+
+    def _render_stems(self, buffer, stems: np.ndarray, pos: int, block_len: int) -> None:
+        """renders a block writing the mix into buffer and the taps into stems"""
+        voice_rows = [(voice, self._stemVoiceRows.get(self._voices.index(voice))) for voice in self._playing]
+        x_row, y_row = self._stemChannelRows
+        for i in range(pos, pos + block_len):
+            total = x_sum = y_sum = 0.0
+            for voice, row in voice_rows:
+                smp, x, y = voice.getNextSampleTaps()
+                total += smp
+                x_sum += x
+                y_sum += y
+                if row is not None:
+                    stems[row, i] = smp
+            buffer[i] = total
+            if x_row is not None:
+                stems[x_row, i] = x_sum
+            if y_row is not None:
+                stems[y_row, i] = y_sum
+
+    def _new_buffer(self, numSamples: int):
+        """output buffer of render() (silent samples are left untouched)"""
+        return [0.0] * numSamples
+
+    def renderTimeline(self, timeline: EventTimeline, numSamples: int, stems: np.ndarray = None) -> List[float]:
+        """renders numSamples applying each event of the timeline exactly at its sample offset.
+        events placed after numSamples are kept pending for the next render"""
+        for event in timeline.getEvents():
+            self._schedule(Event(self._clock + event.sample, event.kind, midiNote=event.midiNote, 
+                                 param=event.param, value=event.value))
+        return self.render(numSamples, stems)
+
+    def _schedule(self, event: Event) -> None:
+        """adds an event (absolute sample) to the pending heap"""
+        event.order = self._eventCount
+        self._eventCount += 1
+        heapq.heappush(self._pending, event)
+
+    def _apply_due_events(self) -> None:
+        """applies every pending event whose sample has been reached"""
+        while self._pending and self._pending[0].sample <= self._clock:
+            self._apply_event(heapq.heappop(self._pending))
+
+    def _apply_event(self, event: Event) -> None:
+        if event.kind == NOTE_ON:
+            self.noteOn(event.midiNote)
+        elif event.kind == NOTE_OFF:
+            if event.voice is None:
+                self.noteOff(event.midiNote)
+            elif event.voice.noteId == event.noteId: # the voice still plays the same note
+                self._allocator.releaseVoice(event.voice)
+                event.voice.noteOff()
+        elif event.kind == PARAM_CHANGE:
+            setter = getattr(self.sound, event.param)
+            if isinstance(event.value, (tuple, list)):
+                setter(*event.value)
+            else:
+                setter(event.value)
+
     def noteOn(self, midiNote:int, numSamples:int=None) -> None:
-        """ Assign the note playback to a free voice """
-        free_voice = next((v for v in self._voices if not v.isPlaying()), None)
-        
-        if free_voice is None: # noteStealing:
-            return             # to implement in the future
+        """ Assign the note playback to a voice (a busy voice is stolen according to the steal policy). 
+        optional: numSamples schedules the noteOff of this voice """
+        voice = self._allocator.allocate(midiNote)
+        if voice is None: # all voices busy and steal policy "none"
+            return
+        if voice.isPlaying(): # stolen voice: hard retrigger
+            voice.noteOff()
+        self._wake(voice)
         
-        #free_voice.resetOperatorsPhase()       # Optional: phase retrig (oscillators)
-        #free_voice.resetLfosPhase()            # Optional: phase retrig (LFOs)
+        #voice.resetOperatorsPhase()       # Optional: phase retrig (oscillators)
+        #voice.resetLfosPhase()            # Optional: phase retrig (LFOs)
         frequency = self.midiNoteToFreq(midiNote)
-        free_voice.noteOn(frequency, numSamples)
+        voice.noteOn(frequency)
+        if numSamples is not None:
+            self._schedule(Event(self._clock + numSamples, NOTE_OFF, voice=voice, noteId=voice.noteId))
     
     def noteOff(self, midiNote:int) -> None:
-        frequency = self.midiNoteToFreq(midiNote)
-        for voice in self._voices:
-            if voice.frequency == frequency:
-                voice.noteOff()
+        """ releases the oldest voice holding midiNote """
+        voice = self._allocator.release(midiNote)
+        if voice is not None:
+            voice.noteOff()
+
+    def setAbortCheck(self, callback) -> None:
+        """ callback() is called at every block boundary of render(): if it returns True the render 
+        stops with RenderCancelled (used by background renders). None removes it """
+        self._abortCheck = callback
+
+    def setStemTaps(self, taps: List[str]) -> List[str]:
+        """ selects the stems written by render(numSamples, stems):
+         * "voice1" ... "voiceN" : output of a voice (after the amp envelope), "voices" adds every voice
+         * "X", "Y"              : algorithm outputs after the amp envelope, before the mix (summed over the voices)
+        returns the stem names (row order). an empty list disables the stems """
+        names = []
+        for tap in taps:
+            if tap == "voices":
+                names += [f"voice{i}" for i in range(1, self.getMaxVoices() + 1)]
+            elif tap in CHANNEL_TAPS or (tap.startswith("voice") and tap[5:].isdigit()
+                                         and 1 <= int(tap[5:]) <= self.getMaxVoices()):
+                names.append(tap)
+            else:
+                raise ValueError(f"Synthesiser: unknown stem tap '{tap}'")
+        if len(set(names)) != len(names):
+            raise ValueError("Synthesiser: duplicated stem taps")
+        self._stemTaps = names
+        self._stemVoiceRows = {int(name[5:]) - 1: row for row, name in enumerate(names) if name.startswith("voice")}
+        self._stemChannelRows = tuple(names.index(c) if c in names else None for c in CHANNEL_TAPS)
+        return list(names)
+
+    def setMetricsKind(self, kind:str) -> None:
+        """ engine label of the fm_voices_active gauge (offline, batch, stream, realtime) """
+        self._metricsKind = kind
+
+    def getStemTaps(self) -> List[str]:
+        return list(self._stemTaps)
+
+    def setStealPolicy(self, policy:str) -> None:
+        """ "oldest", "quietest", "same-note" or "none" (see VoiceAllocator) """
+        self._allocator.setStealPolicy(policy)
+
+    def getAllocatorStats(self) -> dict:
+        """ returns notes played, dropped and stolen by the voice allocator """
+        return self._allocator.getStats()
+
+    def setMaxVoices(self, numVoices:int) -> None:
+        """ sets the polyphony cap. voices are created only when needed, idle voices above the cap are dropped """
+        for voice in self._allocator.setMaxVoices(numVoices): # free voices are parked
+            self._parkedAt.pop(voice, None)
+
+    def getMaxVoices(self) -> int:
+        return self._allocator.getMaxVoices()
+
+    def getSampleRate(self) -> int:
+        return self._sr
 
     def allNotesOff(self):
-        for voice in self._voices:
+        self._allocator.releaseAll()
+        for voice in self._playing:
             voice.noteOff()
 
+    def getRemainingSamples(self):
+        """returns the number of samples before the longest-ringing voice goes idle.
+        None if at least one note is held without a scheduled noteOff"""
+        gate_samples = {} # voice -> samples before its noteOff
+        note_offs = {}    # midi note -> offsets of its noteOff events
+        for event in sorted(self._pending):
+            if event.kind != NOTE_OFF:
+                continue
+            if event.voice is None:
+                note_offs.setdefault(event.midiNote, []).append(event.sample - self._clock)
+            elif event.voice.noteId == event.noteId:
+                gate_samples.setdefault(event.voice, event.sample - self._clock)
+        for midiNote, offsets in note_offs.items(): # each noteOff releases the oldest voice
+            for voice, offset in zip(self._allocator.getHeldVoices(midiNote), offsets):
+                gate_samples[voice] = min(offset, gate_samples.get(voice, offset))
+
+        remaining = 0
+        for voice in self._playing:
+            voice_remaining = voice.getRemainingSamples(gate_samples.get(voice))
+            if voice_remaining is None:
+                return None
+            remaining = max(remaining, voice_remaining)
+        return remaining
+
+    def isSilent(self, threshold:float=0.0) -> bool:
+        """returns True if every voice is idle or released below threshold"""
+        return all(voice.isSilent(threshold) for voice in self._playing)
+
+    def getState(self) -> tuple:
+        """returns the running state of every voice. 
+        two equal states produce the same audio for the same future events.
+        voices are interchangeable in the mix: unless voice stems are rendered, the state has the sounding
+        voices in allocation order and the free voices in the order they will be used, not their identity"""
+        self._sync_parked_voices()
+        if self._stemVoiceRows: # every voice has its own stem
+            voices = self._voices
+            state = self._allocator.getState()
+        else:
+            voices = self._allocator.getActiveVoices() + self._allocator.getFreeVoices()
+            state = self._allocator.getOrderState()
+        idle = ()
+        for voice in voices:
+            voice_state = voice.getState()
+            state += voice_state
+            if not voice.isPlaying():
+                idle += voice_state
+        if idle: # routed LFOs: a voice created later doesn't start from the phases of the free ones
+            state += (len(self._voices),)
+        position = {voice: i for i, voice in enumerate(voices)}
+        for event in sorted(self._pending):
+            voice_index = None if event.voice is None else position[event.voice]
+            state += (event.sample - self._clock, event.kind, event.midiNote, event.param, 
+                      event.value, voice_index, event.noteId == getattr(event.voice, "noteId", None))
+        return state
+
     def resetPhases(self):
         """ resets each operator's phase (used in routes/audio_routes.py) """
         for voice in self._voices:
@@ -115,6 +391,9 @@ class Synthesiser:
         """ resets each lfo's phase (used in routes/audio_routes.py) """
         for voice in self._voices:
             voice.resetLfosPhase()
+        for voice in self._parkedAt:
+            self._parkedAt[voice] = self._clock
+        self._lfoEpoch = self._clock
     
     @staticmethod
     def midiNoteToFreq(midiNote:int):
@@ -1,6 +1,12 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, astuple
+from .class_Adsr import Adsr
+from .class_ParamRegistry import PARAMS
+import sys
 
-@dataclass
+# dataclasses get __slots__ where supported (Python 3.10+)
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class LfoParams:
     dest: int = None
     amount: float = 0.5
@@ -9,6 +15,27 @@ class LfoParams:
     smooth: float = 0.0
 
 
+@dataclass(frozen=True, **_SLOTS)
+class VoiceConfig:
+    """ Immutable snapshot of SynthesiserSound, compiled once per sound version and applied by 
+    every SynthesiserVoice at noteOn. Adsr times are already converted to samples.
+     * sample_rate     : rate used to convert the Adsr times
+     * adsr_amp        : (attack, decay, sustain, release, amp)
+     * operators       : (ratio, feedback, adsr) for A, B1, B2, C. adsr = (a, d, s, r, level) or None (C)
+     * lfos            : (dest, amount, frequency, waveform, smooth) for each LFO
+     * env             : (dest, amount, release in seconds)
+     * mod_base_values : center values of the 13 modulation destinations """
+    version: int
+    sample_rate: int
+    algorithm: int
+    mix: float
+    adsr_amp: tuple
+    operators: tuple
+    lfos: tuple
+    env: tuple
+    mod_base_values: tuple
+
+
 @dataclass
 class SynthesiserSound:
     """ Synthesiser official parameters container.
@@ -35,6 +62,10 @@ class SynthesiserSound:
                  attack_amp=100.0, decay_amp=300.0, sustain_amp=0.8, release_amp=400.0, 
                  amp=1, sample_rate:int=44100):
         
+        # every attribute assignment bumps the version (see __setattr__)
+        self._version = 0
+        self._config:dict = {} # sample rate -> VoiceConfig
+        self._groupVersions:dict = {} # group -> version of its last change
         # general parameters
         self._masterVolume = masterVolume
         self._algorithm = algorithm
@@ -73,14 +104,7 @@ class SynthesiserSound:
         self._ratio_C = ratio_C
         self._feedback_C = feedback_C
 
-        self.lfoDestinationConverter = {
-            "mix":0,
-            "amp":1,
-            "a ratio":2, "a lev":3, "a fb":4,
-            "b1 ratio":5, "b1 lev":6, "b1 fb":7,
-            "b2 ratio":8, "b2 lev":9, "b2 fb":10,
-            "c ratio":11, "c fb": 12
-        }
+        self.lfoDestinationConverter = PARAMS.modNames() # e.g. "a ratio" -> 2
         
         self.lfos = {
             1: LfoParams(),
@@ -92,6 +116,66 @@ class SynthesiserSound:
         self.envDestination:int = None
 
 
+    def __setattr__(self, name, value):
+        """ every parameter change makes a new version of the sound """
+        object.__setattr__(self, name, value)
+        if name not in ("_version", "_config", "_groupVersions"):
+            self._bump_version(PARAMS.groupOf(name))
+
+    def _bump_version(self, group:str=None):
+        object.__setattr__(self, "_version", self._version + 1)
+        if group is not None:
+            self._groupVersions[group] = self._version
+
+    def getDirtyGroups(self, sinceVersion:int) -> set:
+        """ returns the parameter groups changed after sinceVersion ("general", "amp", 
+        "A", "B1", "B2", "C", "lfo1", "lfo2", "lfo3", "env").
+        every engine sharing this sound keeps its own sinceVersion """
+        return {group for group, version in self._groupVersions.items() if version > sinceVersion}
+
+    def getVersion(self) -> int:
+        """ returns a counter incremented by every setter """
+        return self._version
+
+    def pack(self):
+        """ returns a PackedSound: compact immutable snapshot with a stable content hash """
+        from .class_PackedSound import PackedSound
+        return PackedSound.fromSound(self)
+
+    def copy(self) -> "SynthesiserSound":
+        """ returns an independent sound with the same parameters (through pack()) """
+        return self.pack().toSound(self._sr)
+
+    def getVoiceConfig(self, sample_rate:int=None) -> VoiceConfig:
+        """ returns the compiled voice configuration of the current version (built only when needed).
+        Adsr times are converted at sample_rate (default: the rate of the sound), one config per rate """
+        sr = self._sr if sample_rate is None else sample_rate
+        config = self._config.get(sr)
+        if config is None or config.version != self._version:
+            config = self._config[sr] = self._compileVoiceConfig(sr)
+        return config
+
+    def _compileVoiceConfig(self, sr:int) -> VoiceConfig:
+        def adsr(a, d, s, r, lev):
+            return (Adsr.msToSamples(a, sr), Adsr.msToSamples(d, sr), s, Adsr.msToSamples(r, sr), lev)
+        operators = (
+            (self._ratio_A, self._feedback_A, adsr(*self.get_ADSR_A())),
+            (self._ratio_B1, self._feedback_B1, adsr(*self.get_ADSR_B1())),
+            (self._ratio_B2, self._feedback_B2, adsr(*self.get_ADSR_B2())),
+            (self._ratio_C, self._feedback_C, None),
+        )
+        mod_base_values = tuple(getattr(self, d.slot) for d in PARAMS.modDestinations())
+        return VoiceConfig(
+            version = self._version,
+            sample_rate = sr,
+            algorithm = self._algorithm,
+            mix = self._mix,
+            adsr_amp = adsr(*self.get_ADSR_Amp()),
+            operators = operators,
+            lfos = tuple(astuple(self.lfos[i]) for i in sorted(self.lfos)),
+            env = (self.envDestination, self.envAmount, self.envRelease),
+            mod_base_values = mod_base_values,
+        )
 
 # Composite gets
     def get_ADSR_Amp(self):  return (self._attack_amp, self._decay_amp, self._sustain_amp, self._release_amp, self._amp)
@@ -351,10 +435,12 @@ class SynthesiserSound:
             raise ValueError
         if len(args) == 1 and isinstance(args[0], LfoParams): #set from dataClass LfoParams (used for presets logic)
             self.lfos[index] = args[0]
+            self._bump_version(f"lfo{index}")
         elif len(args) == 5: #set manually from args
             dest, amount, frequency, waveform, smooth = args
             dest = convert_destination(dest) # string to integer
             self.lfos[index] = LfoParams(dest, amount, frequency, waveform, smooth)
+            self._bump_version(f"lfo{index}")
         else:
             print("Invalid LFO parameter format")
             raise ValueError
@@ -368,18 +454,23 @@ class SynthesiserSound:
     def setLfoDestination(self, lfoIndex, value):
         """value of type None | int"""
         self.lfos[lfoIndex].dest = value
+        self._bump_version(f"lfo{lfoIndex}")
 
     def setLfoWaveform(self, lfoIndex, value:int):
         self.lfos[lfoIndex].waveform = value
+        self._bump_version(f"lfo{lfoIndex}")
 
     def setLfoAmount(self, lfoIndex, value:float):
         self.lfos[lfoIndex].amount = value
+        self._bump_version(f"lfo{lfoIndex}")
         
     def setLfoRate(self, lfoIndex, value:float):
         self.lfos[lfoIndex].frequency = value
+        self._bump_version(f"lfo{lfoIndex}")
         
     def setLfoSmooth(self, lfoIndex, value:float):
         self.lfos[lfoIndex].smooth = value
+        self._bump_version(f"lfo{lfoIndex}")
 
 
 
@@ -1,6 +1,6 @@
 from typing import List
 from .class_Adsr import Adsr
-from .class_SynthesiserSound import SynthesiserSound
+from .class_SynthesiserSound import SynthesiserSound, VoiceConfig
 from .class_Operator import Operator
 from .class_ModMatrix import ModMatrix
 
@@ -15,6 +15,7 @@ class SynthesiserVoice:
         self._sr = sample_rate
         # internal variables used for synthesis
         self._freq:float = 440.0
+        self._noteId:int = 0 # incremented at every noteOn
         self._algo = None
         self._algo_map:dict[int:callable()] = {1: self._algo1, 2: self._algo2, 3: self._algo3, 
                                                4: self._algo4, 5: self._algo5, 6: self._algo6, 
@@ -28,6 +29,7 @@ class SynthesiserVoice:
         self.C = Operator(sample_rate = self._sr)
         self.operators:List[Operator] = [self.A, self.B1, self.B2, self.C]
         self.modMatrix:ModMatrix = None
+        self._config:VoiceConfig = None # last configuration applied
 
 
     def initialize_modMatrix(self):
@@ -40,36 +42,37 @@ class SynthesiserVoice:
 
             
     def update_static_parameters(self):
-        """sets internal variables equals to the ones stored in _sound state"""
+        """sets internal variables equals to the ones stored in _sound state.
+        the values come from the compiled VoiceConfig, rebuilt by _sound only when a parameter changes"""
+        config = self._sound.getVoiceConfig(self._sr)
         #generals
-        self._algo = self._sound.getAlgorithm()
-        self.setMix(self._sound.getMix())
+        self._algo = config.algorithm
+        self.setMix(config.mix)
         self._algo_func = self._algo_map.get(self._algo)
-        
-        a,d,s,r,amp = self._sound.get_ADSR_Amp()
-        self.adsr_amp.setParams(a,d,s,r,amp)
+        self.adsr_amp.setParams(*config.adsr_amp, in_samples=True)
         # operators
-        for op in self.operators:
-            op.setFreq(self._freq)
-
-        self._op_map = zip(
-            self.operators, # -> [self.A, self.B1, self.B2, self.C]
-            [self._sound.get_ADSR_A, self._sound.get_ADSR_B1, self._sound.get_ADSR_B2, None],
-            [self._sound.get_Params_A, self._sound.get_Params_B1, self._sound.get_Params_B2, self._sound.get_Params_C]
-        )
-
-        for op, adsr_func, param_func in self._op_map:
-            if adsr_func: # operators A, B1, B2
-                a, d, s, r, lev = adsr_func()
-                ratio, fb = param_func()
-                op.setAllParameters(ratio, fb, a, d, s, r, lev)
-            else: # operator C (it's always a carrier, doesn't feature an Adsr for Fm intensity)
-                ratio, fb = param_func()
-                op.setRatio(ratio)
-                op.setFeedback(fb)
+        for op, (ratio, fb, adsr_params) in zip(self.operators, config.operators):
+            op.applyConfig(self._freq, ratio, fb, adsr_params)
         #lfos
-        self.modMatrix.update_parameters() # updated after voice parameters (order matters)
+        self.modMatrix.update_parameters(config, reload = config is not self._config) # updated after voice parameters (order matters)
+        self._config = config
         
+    def apply_parameter_changes(self, groups:set):
+        """applies to the sounding note only the parameter groups changed in _sound
+        (see SynthesiserSound.getDirtyGroups)"""
+        config = self._sound.getVoiceConfig(self._sr)
+        if "general" in groups:
+            self._algo = config.algorithm
+            self._algo_func = self._algo_map.get(self._algo)
+            self.setMix(config.mix)
+        if "amp" in groups:
+            self.adsr_amp.setParams(*config.adsr_amp, in_samples=True)
+        for op, name, (ratio, fb, adsr_params) in zip(self.operators, ("A", "B1", "B2", "C"), config.operators):
+            if name in groups:
+                op.applyConfig(self._freq, ratio, fb, adsr_params)
+        self.modMatrix.apply_parameter_changes(config, groups)
+        self._config = config
+
     def resetOperatorsPhase(self):
         for op in self.operators:
             op.resetPhase()
@@ -77,15 +80,49 @@ class SynthesiserVoice:
     def resetLfosPhase(self):
         self.modMatrix.resetLfoPhases()
 
+    def advanceLfos(self, numSamples:int):
+        """keeps the LFOs in sync while the voice is parked (not rendered)"""
+        self.modMatrix.advance_lfos(numSamples)
+
+    def prepareBlock(self, numSamples:int):
+        """computes the modulations of the next numSamples samples at once (see ModMatrix.prepare_block)"""
+        self.modMatrix.prepare_block(numSamples)
+
     def isPlaying(self) -> bool:
         """returns if this voice is already playing a note"""
         return self.adsr_amp.isPlaying()
     
+    def getRemainingSamples(self, gateSamples:int=None):
+        """returns the number of samples before the voice goes idle.
+        gateSamples: samples left before noteOff (None if the note is held)"""
+        return self.adsr_amp.getRemainingSamples(gateSamples)
+
+    def isSilent(self, threshold:float) -> bool:
+        """returns True if the voice is idle or its release fell below threshold"""
+        if not self.isPlaying():
+            return True
+        return self.adsr_amp.isReleasing() and self.adsr_amp.getLevel() <= threshold
+
+    def getState(self) -> tuple:
+        """returns the running state of the voice (envelopes, phases, modulated values).
+        an idle voice only keeps the state of its routed LFOs: the next noteOn restarts everything else"""
+        if not self.isPlaying():
+            return self.modMatrix.getState(playing=False)
+        state = (self._freq, self._mix_X) + self.adsr_amp.getState()
+        for op in self.operators:
+            state += op.getState()
+        return state + self.modMatrix.getState()
+
     @property
     def frequency(self):
         """returns the frequency of the voice"""
         return self._freq
 
+    @property
+    def noteId(self):
+        """returns a counter identifying the note currently assigned to the voice"""
+        return self._noteId
+
     def setMix(self, value):
         """set mix parameters for channel X, Y"""
         value = min(max(value, 0.0), 1.0)
@@ -99,14 +136,18 @@ class SynthesiserVoice:
     
 
 # SYNTHESIS
-    def noteOn(self, frequency:float, numSamples:int=None):
-        """updates parameters according to SynthesiserSound and triggers all envelopes. optional: numSamples"""
+    def noteOn(self, frequency:float):
+        """updates parameters according to SynthesiserSound and triggers all envelopes"""
         self._freq = frequency #first update the voice frequency
+        self._noteId += 1
         self.update_static_parameters() #then update all parameters (operators frequency depends on voice frequency)
+        restart = not self.isPlaying() # a voice starting from silence restarts its oscillators (a stolen voice doesn't click)
         # trigger all ADSR
-        self.adsr_amp.setGate(True, numSamples)
+        self.adsr_amp.setGate(True)
         for op in self.operators:
-            op.noteOn(frequency, True, numSamples)
+            if restart:
+                op.restart()
+            op.noteOn(frequency, True)
         # prepare the modMatrix
         self.modMatrix.noteOn()
     
@@ -130,6 +171,17 @@ class SynthesiserVoice:
         smp *= self.adsr_amp.getSample() #apply Amp Envelope
         return smp
 
+    def getNextSampleTaps(self):
+        """returns (sample, x, y): the next sample and the algorithm outputs X, Y after the amp envelope 
+        (before the mix). used by the stem render"""
+        if not self.isPlaying():
+            self.modMatrix.advance_lfos()
+            return 0.0, 0.0, 0.0
+        self.modMatrix.apply_modulations()
+        x, y = self._algo_func()
+        amp = self.adsr_amp.getSample()
+        return (y*self._mix_X + x*self._mix_Y) * amp, x * amp, y * amp
+
 
     def _algo1(self):
         """
@@ -257,7 +309,7 @@ if __name__ == "__main__":
 
     sr = 44100
     sig = []
-    voice.noteOn(frequency=440.0, numSamples=sr*2)
+    voice.noteOn(frequency=440.0)
     
     # here I overwrite manually the parameters to test
     voice.adsr_amp.setParams(100, 200, 0.2, 500, None) # amp
@@ -265,7 +317,9 @@ if __name__ == "__main__":
     voice.B2.setAdsrParams = (0.0, 50, 0.1, 500, 10) # b2
     voice._algo = 5
 
-    for _ in range(sr*4):
+    for i in range(sr*4):
+        if i == sr*2:
+            voice.noteOff()
         smp = voice.getNextSample()
         sig.append(smp)
 
@@ -0,0 +1,174 @@
+from .class_SynthesiserVoice import SynthesiserVoice
+from .class_Metrics import NOTES
+from collections import deque
+from typing import Callable, List
+
+STEAL_POLICIES = ("oldest", "quietest", "same-note", "none")
+
+
+class VoiceAllocator:
+    """ Assigns notes to voices in O(1).
+     * voices are created on demand (by createVoice) up to maxVoices
+     * free voices are kept in a free list (the Synthesiser hands back the voices that finished their release)
+     * sounding voices are kept in insertion order (the first one is the oldest)
+     * held notes are kept in a 'midi note -> voices' map, so noteOff doesn't compare frequencies
+
+    When every voice is busy a voice is stolen according to the policy:
+     - "oldest"    : the voice that started first
+     - "quietest"  : the voice with the lowest amp envelope level
+     - "same-note" : the oldest voice holding the same note (falls back to "oldest")
+     - "none"      : the note is dropped """
+    def __init__(self, createVoice:Callable[[], SynthesiserVoice], maxVoices:int, stealPolicy:str="oldest"):
+        self._createVoice = createVoice
+        self._maxVoices = maxVoices
+        self._voices:List[SynthesiserVoice] = []
+        self._free = deque()
+        self._active:dict = {}      # voice -> midi note (insertion ordered: oldest first)
+        self._held:dict = {}        # midi note -> list of gated voices (oldest first)
+        self._stealPolicy = None
+        self.setStealPolicy(stealPolicy)
+        # statistics
+        self._notesOn = 0
+        self._dropped = 0
+        self._stolen = 0
+
+    def setStealPolicy(self, policy:str) -> None:
+        if policy not in STEAL_POLICIES:
+            raise ValueError(f"VoiceAllocator: steal policy must be one of {STEAL_POLICIES}")
+        self._stealPolicy = policy
+
+    def getStealPolicy(self) -> str:
+        return self._stealPolicy
+
+    def setMaxVoices(self, maxVoices:int) -> list:
+        """ sets the polyphony cap. free voices above the cap are dropped (returned), sounding ones are kept 
+        until they finish but no new note starts while the cap is exceeded """
+        self._maxVoices = max(1, int(maxVoices))
+        dropped = []
+        while len(self._voices) > self._maxVoices and self._free:
+            voice = self._free.pop()
+            self._voices.remove(voice)
+            dropped.append(voice)
+        return dropped
+
+    def getMaxVoices(self) -> int:
+        return self._maxVoices
+
+    def getVoices(self) -> List[SynthesiserVoice]:
+        """ returns the voices created so far (the list grows on demand) """
+        return self._voices
+
+    def getStats(self) -> dict:
+        """ returns allocator counters and the current number of voices in use """
+        return {"notes_on": self._notesOn, "dropped": self._dropped, "stolen": self._stolen,
+                "active_voices": len(self._active), "total_voices": len(self._voices),
+                "max_voices": self._maxVoices}
+
+    def getState(self) -> tuple:
+        """ returns the allocation order (voice indices) of free, active and held voices """
+        index = {voice: i for i, voice in enumerate(self._voices)}
+        return (tuple(index[v] for v in self._free),
+                tuple((index[v], note) for v, note in self._active.items()),
+                tuple((note, tuple(index[v] for v in held)) for note, held in sorted(self._held.items())))
+
+    def getOrderState(self) -> tuple:
+        """ returns the allocation order without voice identities: for every sounding voice (oldest first)
+        its note and its position among the gated voices of that note (None if released) """
+        return tuple((note, self._held[note].index(voice) if voice in self._held.get(note, ()) else None)
+                     for voice, note in self._active.items())
+
+    def getActiveVoices(self) -> List[SynthesiserVoice]:
+        """ returns the sounding voices, oldest first """
+        return list(self._active)
+
+    def getFreeVoices(self) -> List[SynthesiserVoice]:
+        """ returns the free voices in the order they will be handed out """
+        return list(self._free)
+
+    def resetStats(self) -> None:
+        self._notesOn = self._dropped = self._stolen = 0
+
+    # ---------------------------
+    # ALLOCATION
+    # ---------------------------
+    def allocate(self, midiNote:int):
+        """ returns the voice that must play midiNote (None if the note is dropped) """
+        self._notesOn += 1
+        voice = self._pop_free()
+        if voice is None:
+            voice = self._steal(midiNote)
+            if voice is None:
+                self._dropped += 1
+                NOTES.inc(outcome="dropped")
+                return None
+            self._stolen += 1
+            NOTES.inc(outcome="stolen")
+            self._forget(voice)
+        else:
+            NOTES.inc(outcome="free")
+        self._active[voice] = midiNote
+        self._held.setdefault(midiNote, []).append(voice)
+        return voice
+
+    def _pop_free(self):
+        if len(self._active) >= self._maxVoices: # cap reached (or lowered below the sounding voices)
+            return None
+        if not self._free and len(self._voices) < self._maxVoices:
+            voice = self._createVoice()
+            self._voices.append(voice)
+            return voice
+        return self._free.popleft() if self._free else None
+
+    def free(self, voice:SynthesiserVoice) -> None:
+        """ moves a voice that finished its release back to the free list """
+        if voice in self._active:
+            self._forget(voice)
+            self._free.append(voice)
+
+    def _steal(self, midiNote:int):
+        if self._stealPolicy == "none" or not self._active:
+            return None
+        if self._stealPolicy == "same-note":
+            held = self._held.get(midiNote)
+            if held:
+                return held[0]
+        if self._stealPolicy == "quietest":
+            return min(self._active, key=lambda v: v.adsr_amp.getLevel())
+        return next(iter(self._active)) # oldest
+
+    def _forget(self, voice:SynthesiserVoice) -> None:
+        """ removes every reference to the voice """
+        midiNote = self._active.pop(voice, None)
+        held = self._held.get(midiNote)
+        if held and voice in held:
+            held.remove(voice)
+            if not held:
+                del self._held[midiNote]
+
+    # ---------------------------
+    # RELEASE
+    # ---------------------------
+    def release(self, midiNote:int):
+        """ returns the oldest gated voice playing midiNote (None if there is none) and unmaps it """
+        held = self._held.get(midiNote)
+        if not held:
+            return None
+        voice = held.pop(0)
+        if not held:
+            del self._held[midiNote]
+        return voice
+
+    def releaseVoice(self, voice:SynthesiserVoice) -> None:
+        """ unmaps a voice released directly (e.g. by a scheduled noteOff) """
+        held = self._held.get(self._active.get(voice))
+        if held and voice in held:
+            held.remove(voice)
+            if not held:
+                del self._held[self._active[voice]]
+
+    def releaseAll(self) -> None:
+        self._held.clear()
+
+    def getHeldVoices(self, midiNote:int) -> list:
+        """ returns the gated voices playing midiNote (oldest first) """
+        return list(self._held.get(midiNote, ()))
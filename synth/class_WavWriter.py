@@ -0,0 +1,112 @@
+import io
+import struct
+import numpy as np
+
+CHUNK_SIZE = 65536 # frames converted at a time
+# format -> (bytes per sample, WAV format tag)
+SAMPLE_FORMATS = {"int16": (2, 1), "int24": (3, 1), "float32": (4, 3)}
+
+
+class WavWriter:
+    """ Writes float audio to a WAV file chunk by chunk (16/24 bit PCM or 32 bit float).
+    Every chunk is clipped to [-1, 1] (NaN -> 0) in a chunk-sized scratch buffer and written
+    straight to the output, so the signal is never copied as a whole.
+
+    *Example usage*
+    -----------------
+    >>> with open("out.wav", "wb") as f:
+    ...     writer = WavWriter(f, 44100, "int24")
+    ...     writer.write(block1)
+    ...     writer.write(block2)
+    ...     writer.close()                              # patches the sizes in the header
+    >>> memory_file = WavWriter.encode(sig, 44100)      # whole signal -> io.BytesIO
+    """
+    def __init__(self, fileobj, sample_rate:int, sampleFormat:str="int16", numChannels:int=1):
+        if sampleFormat not in SAMPLE_FORMATS:
+            raise ValueError(f"WavWriter: sample format must be one of {tuple(SAMPLE_FORMATS)}")
+        self._file = fileobj
+        self._sr = sample_rate
+        self._format = sampleFormat
+        self._channels = numChannels
+        self._width, self._tag = SAMPLE_FORMATS[sampleFormat]
+        self._frames = 0
+        self._start = fileobj.tell()
+        fileobj.write(self._header(0))
+
+    @staticmethod
+    def headerSize(sampleFormat:str) -> int:
+        return 58 if SAMPLE_FORMATS[sampleFormat][1] == 3 else 44
+
+    def _header(self, numFrames:int) -> bytes:
+        """ RIFF header. float files also have the fact chunk required by non-PCM formats """
+        data_size = numFrames * self._channels * self._width
+        block_align = self._channels * self._width
+        is_float = self._tag == 3
+        fmt = struct.pack("<HHIIHH", self._tag, self._channels, self._sr, self._sr * block_align,
+                          block_align, self._width * 8)
+        if is_float:
+            fmt += struct.pack("<H", 0)
+        header = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        if is_float:
+            header += b"fact" + struct.pack("<II", 4, numFrames * self._channels)
+        header += b"data" + struct.pack("<I", data_size)
+        return b"RIFF" + struct.pack("<I", 4 + len(header) + data_size) + b"WAVE" + header
+
+    @staticmethod
+    def convert(chunk:np.ndarray, sampleFormat:str, out:np.ndarray=None) -> np.ndarray:
+        """ float chunk -> little-endian samples (a uint8 array of width bytes per sample).
+        out: optional destination (e.g. a view of the output file buffer) """
+        scratch = np.clip(chunk, -1.0, 1.0, dtype=np.float32 if sampleFormat == "float32" else np.float64)
+        np.nan_to_num(scratch, copy=False, nan=0.0)
+        if sampleFormat == "float32":
+            samples = scratch.astype("<f4", copy=False).reshape(-1).view(np.uint8)
+        elif sampleFormat == "int16":
+            scratch *= 32767
+            samples = scratch.astype("<i2").reshape(-1).view(np.uint8)
+        else: # int24: low 3 bytes of each little-endian int32
+            scratch *= 8388607
+            samples = scratch.astype("<i4").reshape(-1).view(np.uint8).reshape(-1, 4)[:, :3].reshape(-1)
+        if out is None:
+            return samples
+        out[:] = samples
+        return out
+
+    def write(self, chunk:np.ndarray) -> None:
+        """ appends frames (1d array, or (frames, channels) for multichannel files) """
+        chunk = np.asarray(chunk)
+        for start in range(0, len(chunk), CHUNK_SIZE):
+            self._file.write(self.convert(chunk[start:start + CHUNK_SIZE], self._format).tobytes())
+        self._frames += len(chunk)
+
+    def close(self) -> None:
+        """ writes the final sizes in the header (the file object is left open) """
+        end = self._file.tell()
+        self._file.seek(self._start)
+        self._file.write(self._header(self._frames))
+        self._file.seek(end)
+
+    @classmethod
+    def encode(cls, sig:np.ndarray, sample_rate:int, sampleFormat:str="int16") -> io.BytesIO:
+        """ returns the WAV file of the whole signal in a BytesIO allocated once:
+        chunks are converted directly into its buffer """
+        sig = np.asarray(sig)
+        numChannels = 1 if sig.ndim == 1 else sig.shape[1]
+        memory_file = io.BytesIO()
+        writer = cls(memory_file, sample_rate, sampleFormat, numChannels)
+        writer._frames = len(sig)
+        frame_bytes = numChannels * writer._width
+        header_size = cls.headerSize(sampleFormat)
+        memory_file.seek(header_size + len(sig) * frame_bytes - 1)
+        memory_file.write(b"\0") # allocates the whole file
+        buffer = memory_file.getbuffer()
+        try:
+            data = np.frombuffer(buffer, dtype=np.uint8, offset=header_size)
+            for start in range(0, len(sig), CHUNK_SIZE):
+                stop = min(start + CHUNK_SIZE, len(sig))
+                cls.convert(sig[start:stop], sampleFormat, out=data[start * frame_bytes:stop * frame_bytes])
+            del data
+        finally:
+            buffer.release() # the BytesIO can be closed again
+        writer.close()
+        memory_file.seek(0)
+        return memory_file